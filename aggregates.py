@@ -0,0 +1,67 @@
+import pandas as pd
+
+from storage import COUNT_KEY_COLUMNS
+
+COUNT_COLUMNS = COUNT_KEY_COLUMNS + ["oui", "non"]
+
+
+def counts_frame(rows):
+    """Convertit les compteurs agrégés du stockage en DataFrame"""
+    df = pd.DataFrame(rows, columns=COUNT_COLUMNS)
+    df['day'] = pd.to_datetime(df['day'])
+    df['total'] = df['oui'] + df['non']
+    return df
+
+
+def summary_metrics(counts):
+    """Métriques principales : total, clients, taux de réponses positives, score moyen"""
+    total = int(counts['total'].sum())
+    oui = int(counts['oui'].sum())
+    return {
+        'total': total,
+        'clients': counts['client_name'].nunique(),
+        'positive_rate': oui / total * 100 if total else 0.0,
+        'score': oui / total if total else 0.0,
+    }
+
+
+def response_by_group(counts):
+    """Nombre de Oui/Non par groupe (pour le graphique en barres)"""
+    df = counts.groupby('group')[['oui', 'non']].sum()
+    return df.rename(columns={'oui': 'Oui', 'non': 'Non'})
+
+
+def _stats_table(df):
+    """Met en forme des sommes Total/Oui/Non avec le pourcentage de Oui"""
+    df = df.rename(columns={'total': 'Total', 'oui': 'Oui', 'non': 'Non'})
+    df['% Oui'] = (df['Oui'] / df['Total'] * 100).round(1)
+    return df[['Total', 'Oui', 'Non', '% Oui']]
+
+
+def group_stats(counts):
+    """Statistiques par groupe : Total, Oui, Non, % Oui"""
+    return _stats_table(counts.groupby('group')[['total', 'oui', 'non']].sum())
+
+
+def question_stats(counts, group=None):
+    """Statistiques par (groupe, question), ou par question pour un seul groupe"""
+    if group is not None:
+        return _stats_table(counts[counts['group'] == group].groupby('question')[['total', 'oui', 'non']].sum())
+    return _stats_table(counts.groupby(['group', 'question'])[['total', 'oui', 'non']].sum())
+
+
+def _scores(df):
+    """Taux de Oui (%) dans 'response' et score moyen dans 'coefficient'"""
+    df['response'] = df['oui'] / df['total'] * 100
+    df['coefficient'] = df['oui'] / df['total']
+    return df.drop(columns=['total', 'oui']).reset_index().rename(columns={'day': 'date'})
+
+
+def daily_stats(counts):
+    """Score moyen et taux de Oui par jour"""
+    return _scores(counts.groupby('day')[['total', 'oui']].sum())
+
+
+def group_trends(counts):
+    """Score moyen et taux de Oui par jour et par groupe"""
+    return _scores(counts.groupby(['day', 'group'])[['total', 'oui']].sum())
@@ -1,11 +1,13 @@
 import streamlit as st
-import json
 import os
 from datetime import datetime
 import pandas as pd
 import plotly.express as px
 from auth import is_logged_in, require_auth, is_admin
-import shutil
+import storage
+import backups
+import backup_diff
+from response_frame import load_response_frame
 
 # Configuration de la page
 st.set_page_config(
@@ -21,47 +23,21 @@ os.makedirs("database/responses", exist_ok=True)
 os.makedirs("database/users", exist_ok=True)
 os.makedirs("exports", exist_ok=True)
 
-def load_responses(file_path="database/responses/responses_history.json"):
-    """Charge les réponses depuis un fichier"""
-    try:
-        with open(file_path, "r", encoding='utf-8') as f:
-            return json.load(f)
-    except FileNotFoundError:
-        return []
-
-def load_questions():
-    """Charge les questions"""
-    try:
-        with open("database/responses/questions.json", "r", encoding='utf-8') as f:
-            return json.load(f)
-    except FileNotFoundError:
-        return []
-
 def get_backup_files():
-    """Récupère la liste des fichiers de backup"""
-    backup_dir = "database/backups"
-    return [f for f in os.listdir(backup_dir) if f.endswith('.json')]
-
-def compare_responses(current_data, backup_data):
-    """Compare les données actuelles avec un backup"""
-    current_df = pd.DataFrame(current_data)
-    backup_df = pd.DataFrame(backup_data)
-    
-    # Comparaison des statistiques
-    stats = {
-        'Total réponses': {
-            'Actuel': len(current_df),
-            'Backup': len(backup_df),
-            'Différence': len(current_df) - len(backup_df)
-        },
-        'Clients uniques': {
-            'Actuel': current_df['client_name'].nunique(),
-            'Backup': backup_df['client_name'].nunique(),
-            'Différence': current_df['client_name'].nunique() - backup_df['client_name'].nunique()
-        }
-    }
-    
-    return stats
+    """Récupère la liste des backups (catalogue, du plus récent au plus ancien)"""
+    return backups.list_backups()
+
+@st.cache_data(show_spinner="Comparaison avec le backup...", max_entries=8)
+def compare_with_backup(backup_name, backup_checksum, live_signature):
+    """Compare le stockage actif et un backup (résultat mis en cache tant que ni l'un ni l'autre ne change)"""
+    return backup_diff.diff_backup(os.path.join(backups.BACKUP_DIR, backup_name))
+
+def live_signature():
+    """Signature des fichiers du stockage actif (taille et date de modification)"""
+    return tuple(
+        (path, os.path.getmtime(path), os.path.getsize(path))
+        for path in storage.get_storage().files('responses') if os.path.exists(path)
+    )
 
 # Vérifier si l'utilisateur est connecté
 if not is_logged_in():
@@ -77,8 +53,8 @@ if st.session_state.get('role') == 'admin':
     st.sidebar.info("🔑 Statut: Administrateur")
 
 # Chargement des données
-current_responses = load_responses()
-questions = load_questions()
+df_responses = load_response_frame()
+questions = storage.load_questions()
 
 # Filtres dans la sidebar
 st.sidebar.markdown("### 🔍 Filtres")
@@ -86,7 +62,7 @@ st.sidebar.markdown("### 🔍 Filtres")
 # Récupérer tous les groupes uniques
 all_groups = []
 if questions:
-    all_groups = list(set(q['group'] for q in questions))
+    all_groups = [q['key'] for q in questions]
 
 selected_groups = st.sidebar.multiselect(
     "Filtrer par groupe",
@@ -106,12 +82,11 @@ Cette application vous permet de :
 """)
 
 # Statistiques rapides
-if current_responses:
+if not df_responses.empty:
     # Filtrer les réponses par groupe si nécessaire
-    filtered_responses = [
-        r for r in current_responses 
-        if r.get('group') in selected_groups
-    ] if selected_groups else current_responses
+    filtered_responses = df_responses[
+        df_responses['group'].isin(selected_groups)
+    ] if selected_groups else df_responses
     
     col1, col2, col3 = st.columns(3)
     
@@ -120,21 +95,20 @@ if current_responses:
         st.metric("Total des réponses", total_responses)
     
     with col2:
-        if filtered_responses:
-            last_response = datetime.fromisoformat(filtered_responses[-1]['date'])
+        if not filtered_responses.empty:
+            last_response = filtered_responses['date'].max()
             days_since = (datetime.now() - last_response).days
             st.metric("Dernière réponse", f"Il y a {days_since} jours")
     
     with col3:
-        unique_clients = len(set(r['client_name'] for r in filtered_responses))
+        unique_clients = filtered_responses['client_name'].nunique()
         st.metric("Clients uniques", unique_clients)
 
     # Graphique des réponses dans le temps
-    if filtered_responses:
-        df_responses = pd.DataFrame(filtered_responses)
-        df_responses['date'] = pd.to_datetime(df_responses['date']).dt.date
-        
-        df_daily = df_responses.groupby(['date', 'group']).size().reset_index(name='count')
+    if not filtered_responses.empty:
+        df_daily = filtered_responses.groupby(
+            [filtered_responses['date'].dt.date, 'group'], observed=True
+        ).size().reset_index(name='count')
         
         fig = px.line(
             df_daily,
@@ -152,40 +126,59 @@ if is_admin():
     
     backup_files = get_backup_files()
     if backup_files:
+        catalog = backups.read_catalog()
         selected_backup = st.selectbox(
             "Sélectionner un backup à comparer",
             options=backup_files,
-            format_func=lambda x: f"Backup du {x.split('_')[1].split('.')[0]}"
+            format_func=lambda x: f"Backup du {datetime.fromisoformat(catalog['backups'][x]['date']).strftime('%d/%m/%Y %H:%M')} ({x})"
         )
         
         if selected_backup:
-            backup_path = os.path.join("database/backups", selected_backup)
-            backup_responses = load_responses(backup_path)
+            backup_path = os.path.join(backups.BACKUP_DIR, selected_backup)
+            diff = compare_with_backup(selected_backup, catalog['backups'][selected_backup].get('sha256'), live_signature())
             
-            if backup_responses:
-                stats = compare_responses(current_responses, backup_responses)
-                
-                st.markdown("#### Comparaison des statistiques")
-                for metric, values in stats.items():
-                    col1, col2, col3 = st.columns(3)
-                    with col1:
-                        st.metric(f"{metric} (Actuel)", values['Actuel'])
-                    with col2:
-                        st.metric(f"{metric} (Backup)", values['Backup'])
-                    with col3:
-                        st.metric("Différence", values['Différence'])
+            st.markdown("#### Comparaison des statistiques")
+            stats = {
+                'Total réponses': (diff['records']['current'], diff['records']['backup']),
+                'Clients uniques': (diff['clients']['current'], diff['clients']['backup']),
+            }
+            for metric, (current, backup) in stats.items():
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    st.metric(f"{metric} (Actuel)", current)
+                with col2:
+                    st.metric(f"{metric} (Backup)", backup)
+                with col3:
+                    st.metric("Différence", current - backup)
+            
+            st.markdown("#### Questionnaires depuis ce backup")
+            col1, col2, col3, col4 = st.columns(4)
+            col1.metric("Ajoutés", diff['submissions']['added'])
+            col2.metric("Supprimés", diff['submissions']['removed'])
+            col3.metric("Modifiés", diff['submissions']['changed'])
+            col4.metric("Identiques", diff['submissions']['unchanged'])
+            
+            if diff['by_client_group']:
+                st.dataframe(
+                    pd.DataFrame(diff['by_client_group']).rename(columns={
+                        'client_name': 'Client', 'group': 'Groupe',
+                        'added': 'Ajoutés', 'removed': 'Supprimés', 'changed': 'Modifiés'
+                    }),
+                    hide_index=True,
+                    use_container_width=True
+                )
+            
+            if st.button("🔄 Restaurer ce backup"):
+                # Créer un backup des données actuelles avant la restauration
+                backups.create_backup(st.session_state.username, mode="incremental")
                 
-                if st.button("🔄 Restaurer ce backup"):
-                    # Créer un backup des données actuelles avant la restauration
-                    current_time = datetime.now().strftime("%Y%m%d_%H%M%S")
-                    backup_filename = f"backup_{current_time}.json"
-                    shutil.copy2(
-                        "database/responses/responses_history.json",
-                        f"database/backups/{backup_filename}"
-                    )
-                    
-                    # Restaurer le backup sélectionné
-                    shutil.copy2(backup_path, "database/responses/responses_history.json")
+                # Restaurer le backup sélectionné
+                restored_files, errors = backups.restore_backup(backup_path)
+                if errors:
+                    # Pas de rechargement : les erreurs restent affichées
+                    for file, error in errors.items():
+                        st.error(f"Erreur lors de la restauration de {file}: {error}")
+                else:
                     st.success("✅ Backup restauré avec succès ! La page va se recharger...")
                     st.rerun()
     else:
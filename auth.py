@@ -1,7 +1,72 @@
 import streamlit as st
 import json
 import os
-from hashlib import sha256
+import sys
+import threading
+import time
+from collections import deque, namedtuple
+import backups
+import passwords
+import sessions
+import storage
+
+# Entrée de l'annuaire : identifiants et rôle en une seule recherche
+UserEntry = namedtuple("UserEntry", ["username", "password", "role"])
+
+
+class UserDirectory:
+    """Annuaire des utilisateurs partagé par toutes les sessions du processus
+
+    L'index en mémoire est celui du cache de stockage : il n'est reconstruit que
+    lorsque le fichier (ou la base) des utilisateurs change. Chaque recherche est
+    chronométrée sur une fenêtre glissante.
+    """
+
+    def __init__(self, window=1000):
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.misses = 0
+
+    def lookup(self, username):
+        """Retourne l'entrée d'un utilisateur (UserEntry) ou None s'il n'existe pas"""
+        start = time.perf_counter()
+        found = storage.load_user_index().get(username)
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self._latencies.append(elapsed)
+            self.lookups += 1
+            if found is None:
+                self.misses += 1
+        return UserEntry(username, *found) if found is not None else None
+
+    def stats(self):
+        """Nombre de recherches et latences (ms) sur la fenêtre glissante"""
+        with self._lock:
+            latencies = sorted(self._latencies)
+            lookups, misses = self.lookups, self.misses
+        if not latencies:
+            return {'lookups': lookups, 'unknown': misses, 'mean_ms': 0.0, 'p95_ms': 0.0, 'max_ms': 0.0}
+        return {
+            'lookups': lookups,
+            'unknown': misses,
+            'mean_ms': 1000 * sum(latencies) / len(latencies),
+            'p95_ms': 1000 * latencies[int(0.95 * (len(latencies) - 1))],
+            'max_ms': 1000 * latencies[-1],
+        }
+
+
+_directory = UserDirectory()
+
+
+def get_user_directory():
+    """Retourne l'annuaire des utilisateurs du processus"""
+    return _directory
+
+
+def directory_stats():
+    """Compteurs et latences de l'annuaire des utilisateurs"""
+    return _directory.stats()
 
 def init_session_state():
     """Initialise les variables de session"""
@@ -11,43 +76,113 @@ def init_session_state():
         st.session_state.username = None
     if 'role' not in st.session_state:
         st.session_state.role = None
+    if 'session_token' not in st.session_state:
+        st.session_state.session_token = None
 
 def load_users():
-    """Charge les utilisateurs depuis le fichier JSON"""
-    try:
-        with open("database/users/users.json", "r") as f:
-            return json.load(f)
-    except FileNotFoundError:
-        return {}
+    """Charge les utilisateurs depuis le stockage"""
+    return storage.load_users()
+
+def authenticate(username: str, password: str):
+    """Vérifie les identifiants et retourne l'entrée de l'utilisateur (None si invalides)
+
+    La vérification s'exécute dans le pool de hachage ; un mot de passe à
+    l'ancien format ou aux coûts dépassés est re-haché en arrière-plan.
+    """
+    entry = _directory.lookup(username)
+    if not passwords.check_password(password, entry.password if entry is not None else None):
+        return None
+    passwords.schedule_rehash(username, password, entry.password)
+    return entry
 
 def is_valid_credentials(username: str, password: str) -> bool:
     """Vérifie si les identifiants sont valides"""
-    users = load_users()
-    return username in users and users[username]["password"] == password
+    return authenticate(username, password) is not None
 
 def get_user_role(username: str) -> str:
     """Récupère le rôle de l'utilisateur"""
-    users = load_users()
-    return users.get(username, {}).get("role", "user")
+    entry = _directory.lookup(username)
+    return entry.role if entry is not None else "user"
 
 def login(username: str, password: str) -> bool:
     """Connecte l'utilisateur"""
-    if is_valid_credentials(username, password):
+    entry = authenticate(username, password)
+    if entry is not None:
         st.session_state.authenticated = True
         st.session_state.username = username
-        st.session_state.role = get_user_role(username)
+        st.session_state.role = entry.role
+        # Le cookie est déposé par restore_session au rerun qui suit la connexion
+        st.session_state.session_token = sessions.get_session_store().create(username)
         return True
     return False
 
 def logout():
     """Déconnecte l'utilisateur"""
+    if st.session_state.get('session_token'):
+        sessions.get_session_store().revoke(st.session_state.session_token)
     st.session_state.authenticated = False
     st.session_state.username = None
     st.session_state.role = None
+    st.session_state.session_token = None
+    if st.context.cookies.get(sessions.COOKIE_NAME) or st.session_state.get('session_cookie'):
+        set_session_cookie(None)
+
+def set_session_cookie(token):
+    """Dépose (ou efface si token est None) le cookie de session dans le navigateur
+
+    Streamlit ne permet que de lire les cookies (st.context.cookies, figés à
+    l'ouverture de la connexion) : le cookie est écrit par un script du
+    document parent, une seule fois par valeur. Il est limité au site
+    (SameSite=Strict) et marqué Secure en HTTPS.
+    """
+    value = token or ""
+    if st.session_state.get('session_cookie', None) == value:
+        return
+    st.session_state.session_cookie = value
+    max_age = sessions.SESSION_TTL if token else 0
+    script = f"""
+        <script>
+        const secure = window.parent.location.protocol === "https:" ? "; Secure" : "";
+        window.parent.document.cookie = "{sessions.COOKIE_NAME}={value}; Path=/; Max-Age={max_age}; SameSite=Strict" + secure;
+        </script>
+    """
+    if hasattr(st, "iframe"):
+        st.iframe(script, height=1)
+    else:
+        # Versions de Streamlit antérieures à st.iframe
+        import streamlit.components.v1 as components
+        components.html(script, height=0)
+
+def restore_session() -> bool:
+    """Valide le jeton de session (session Streamlit ou cookie d'un nouvel onglet)
+
+    Le rôle est relu dans l'annuaire : un compte supprimé ou un rôle modifié
+    est pris en compte au rerun suivant. Retourne False si la session est
+    absente, expirée ou invalidée.
+    """
+    token = st.session_state.get('session_token') or st.context.cookies.get(sessions.COOKIE_NAME)
+    username = sessions.get_session_store().validate(token) if token else None
+    entry = _directory.lookup(username) if username is not None else None
+    if entry is None:
+        if token or st.session_state.get('authenticated'):
+            logout()
+        return False
+    st.session_state.authenticated = True
+    st.session_state.username = username
+    st.session_state.role = entry.role
+    st.session_state.session_token = token
+    if st.context.cookies.get(sessions.COOKIE_NAME) != token:
+        set_session_cookie(token)
+    return True
+
+def start_background_jobs():
+    """Démarre les tâches de fond du serveur (idempotent), quelle que soit la page ouverte en premier"""
+    backups.start_scheduler()
 
 def is_logged_in() -> bool:
-    """Vérifie si l'utilisateur est connecté"""
-    return st.session_state.get('authenticated', False)
+    """Vérifie si l'utilisateur est connecté (jeton de session valide)"""
+    start_background_jobs()
+    return restore_session()
 
 def is_admin() -> bool:
     """Vérifie si l'utilisateur est un administrateur"""
@@ -55,9 +190,10 @@ def is_admin() -> bool:
 
 def require_auth(role: str = None):
     """Vérifie l'authentification et le rôle optionnel"""
+    start_background_jobs()
     init_session_state()
     
-    if not is_logged_in():
+    if not restore_session():
         st.warning("Veuillez vous connecter pour accéder à cette page.")
         show_login_form()
         st.stop()
@@ -81,14 +217,40 @@ def show_login_form():
                 st.error("Nom d'utilisateur ou mot de passe incorrect")
 
 def save_users(users):
-    """Sauvegarde les utilisateurs dans un fichier JSON"""
-    with open("users.json", "w") as f:
-        json.dump(users, f, indent=4)
+    """Sauvegarde les utilisateurs dans le stockage"""
+    storage.save_users(users)
 
 def hash_password(password):
-    """Hash le mot de passe avec SHA-256"""
-    return sha256(password.encode()).hexdigest()
+    """Hache le mot de passe (sel aléatoire, algorithme et coûts de passwords.py)"""
+    return passwords.hash_password(password)
 
 def is_authenticated():
     """Vérifie si l'utilisateur est authentifié"""
-    return st.session_state.get('authenticated', False) 
\ No newline at end of file
+    return st.session_state.get('authenticated', False) 
+
+
+def benchmark(accounts=5000, lookups=100000):
+    """Mesure les recherches dans l'annuaire avec un grand nombre de comptes (membres de coopératives)"""
+    import tempfile
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        try:
+            os.makedirs(os.path.dirname(storage.USERS_FILE))
+            with open(storage.USERS_FILE, "w", encoding='utf-8') as f:
+                json.dump({f"membre{n}": {"password": f"pass{n}", "role": "user"} for n in range(accounts)}, f)
+            directory = UserDirectory(window=lookups)
+            start = time.perf_counter()
+            for n in range(lookups):
+                directory.lookup(f"membre{n % (accounts + 100)}")
+            elapsed = time.perf_counter() - start
+        finally:
+            os.chdir(cwd)
+    return {'accounts': accounts, 'lookups_per_second': lookups / elapsed, **directory.stats()}
+
+
+if __name__ == "__main__":
+    # python auth.py [comptes recherches]
+    params = [int(arg) for arg in sys.argv[1:3]]
+    print(json.dumps(benchmark(*params), indent=4))
@@ -0,0 +1,207 @@
+import hashlib
+import json
+import os
+import sys
+import time
+
+import backups
+import storage
+from storage import COMMIT_MARKER, HISTORY_LOG_FILE, LEGACY_HISTORY_FILE, RESPONSE_COLUMNS
+
+# Somme des empreintes modulo 2^128 : indépendante de l'ordre des réponses
+HASH_MODULUS = 1 << 128
+
+
+def iter_log_records(blocks):
+    """Lit un journal NDJSON fourni par blocs d'octets, avec la sémantique des lignes de validation
+
+    Les réponses d'un questionnaire ne sont rendues qu'une fois sa ligne de
+    validation lue ; les réponses antérieures aux identifiants passent telles quelles.
+    """
+    pending_line = b""
+    pending = {}
+    previous_id = None
+    for data in blocks:
+        lines = (pending_line + data).split(b"\n")
+        pending_line = lines.pop()
+        for line in lines:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            submission_id = record.get('submission_id')
+            if COMMIT_MARKER in record:
+                yield from pending.pop(record[COMMIT_MARKER], ([],))[0]
+            elif submission_id:
+                storage.stage_record(pending, record, previous_id)
+            else:
+                yield record
+            previous_id = submission_id
+    # Une dernière ligne sans fin de ligne est tronquée : elle est ignorée comme dans read_responses
+
+
+def iter_live_records():
+    """Parcourt les réponses du stockage actif (journal lu en flux pour le stockage JSON)"""
+    if storage.STORAGE_BACKEND == "sqlite":
+        yield from storage.load_responses()
+        return
+    storage.migrate_legacy_history()
+    if not os.path.exists(HISTORY_LOG_FILE):
+        return
+    with open(HISTORY_LOG_FILE, "rb") as f:
+        yield from iter_log_records(iter(lambda: f.read(backups.STREAM_BLOCK_SIZE), b""))
+
+
+def iter_backup_records(backup_path):
+    """Parcourt les réponses contenues dans un backup (ZIP ou incrémental) sans l'extraire"""
+    for name, blocks in backups.iter_backup_files(backup_path):
+        if name == os.path.basename(HISTORY_LOG_FILE):
+            yield from iter_log_records(blocks)
+        elif name == os.path.basename(LEGACY_HISTORY_FILE):
+            # Ancien format : un seul tableau JSON
+            yield from json.loads(b"".join(blocks))
+
+
+def submission_key(record):
+    """Identifie le questionnaire d'une réponse
+
+    Les réponses antérieures aux identifiants sont regroupées par
+    utilisateur, client et jour.
+    """
+    if record.get('submission_id'):
+        return record['submission_id']
+    return f"{record.get('username')}|{record.get('client_name')}|{(record.get('date') or '')[:10]}"
+
+
+def _record_hash(record):
+    """Empreinte du contenu d'une réponse (colonnes du stockage, quel que soit l'ordre des clés)"""
+    content = "\x1f".join(str(record.get(col) or '') for col in RESPONSE_COLUMNS)
+    return int.from_bytes(hashlib.blake2b(content.encode('utf-8'), digest_size=16).digest(), 'big')
+
+
+def digest_records(records):
+    """Résume un flux de réponses par (questionnaire, groupe) : {clé: [client, empreinte, réponses]}
+
+    La mémoire dépend du nombre de questionnaires, pas du nombre de réponses.
+    """
+    units = {}
+    for record in records:
+        key = (submission_key(record), record.get('group') or '')
+        unit = units.get(key)
+        if unit is None:
+            unit = units[key] = [record.get('client_name') or '', 0, 0]
+        unit[1] = (unit[1] + _record_hash(record)) % HASH_MODULUS
+        unit[2] += 1
+    return units
+
+
+def diff_units(current, backup):
+    """Compare deux résumés : questionnaires ajoutés, supprimés et modifiés, par client et par groupe"""
+    by_client_group = {}
+    submissions = {}
+
+    def count(client, group, status):
+        row = by_client_group.setdefault((client, group), {'added': 0, 'removed': 0, 'changed': 0})
+        row[status] += 1
+
+    for key in current.keys() | backup.keys():
+        submission, group = key
+        now, before = current.get(key), backup.get(key)
+        if before is None:
+            status = 'added'
+        elif now is None:
+            status = 'removed'
+        elif now[1] != before[1]:
+            status = 'changed'
+        else:
+            submissions.setdefault(submission, set()).add('unchanged')
+            continue
+        count((now or before)[0], group, status)
+        submissions.setdefault(submission, set()).add(status)
+
+    # Un questionnaire n'est ajouté ou supprimé que si tous ses groupes le sont
+    totals = {'added': 0, 'removed': 0, 'changed': 0, 'unchanged': 0}
+    for statuses in submissions.values():
+        if len(statuses) == 1:
+            totals[next(iter(statuses))] += 1
+        else:
+            totals['changed'] += 1
+
+    return {
+        'submissions': totals,
+        'records': {
+            'current': sum(unit[2] for unit in current.values()),
+            'backup': sum(unit[2] for unit in backup.values()),
+        },
+        'clients': {
+            'current': len({unit[0] for unit in current.values()}),
+            'backup': len({unit[0] for unit in backup.values()}),
+        },
+        'by_client_group': [
+            {'client_name': client, 'group': group, **row}
+            for (client, group), row in sorted(by_client_group.items())
+        ],
+    }
+
+
+def backup_digest(backup_path, checksum=None):
+    """Résumé d'un backup, calculé une seule fois puis relu depuis le cache disque"""
+    checksum = checksum or backups.file_checksum(backup_path)
+    cache_path = os.path.join(backups.DIGEST_DIR, f"{checksum}.json")
+    try:
+        with open(cache_path, "r", encoding='utf-8') as f:
+            return {(sub, group): [client, int(digest, 16), count] for sub, group, client, digest, count in json.load(f)}
+    except (FileNotFoundError, json.JSONDecodeError):
+        pass
+    units = digest_records(iter_backup_records(backup_path))
+    os.makedirs(backups.DIGEST_DIR, exist_ok=True)
+    temp_path = f"{cache_path}.{os.getpid()}.tmp"
+    with open(temp_path, "w", encoding='utf-8') as f:
+        json.dump([[sub, group, client, f"{digest:x}", count] for (sub, group), (client, digest, count) in units.items()], f)
+    os.replace(temp_path, cache_path)
+    return units
+
+
+def diff_backup(backup_path):
+    """Compare le stockage actif et un backup, questionnaire par questionnaire"""
+    entry = backups.read_catalog()['backups'].get(os.path.basename(backup_path), {})
+    return diff_units(digest_records(iter_live_records()), backup_digest(backup_path, entry.get('sha256')))
+
+
+def _synthetic_log(path, submissions, questions=45, seed=0):
+    """Écrit un journal synthétique (questionnaires validés) pour les mesures"""
+    with open(path, "w", encoding='utf-8') as f:
+        for n in range(submissions):
+            submission_id = f"{seed}-{n}"
+            for q in range(questions):
+                f.write(json.dumps({
+                    "date": f"2025-04-{1 + n % 28:02d}T10:00:00", "username": f"user{n % 20}",
+                    "client_name": f"client{n % 500}", "group": f"groupe{q % 6}", "group_title": f"Groupe {q % 6}",
+                    "question": f"Question {q}", "response": "Oui" if (n + q) % 3 else "Non", "comment": "",
+                    "submission_id": submission_id
+                }) + "\n")
+            f.write(json.dumps({COMMIT_MARKER: submission_id}) + "\n")
+
+
+def benchmark(submissions=20000):
+    """Mesure le temps de comparaison de deux journaux (45 réponses par questionnaire)"""
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "responses_history.jsonl")
+        _synthetic_log(path, submissions)
+        start = time.perf_counter()
+        with open(path, "rb") as f:
+            units = digest_records(iter_log_records(iter(lambda: f.read(backups.STREAM_BLOCK_SIZE), b"")))
+        result = diff_units(units, dict(list(units.items())[len(units) // 10:]))
+        elapsed = time.perf_counter() - start
+    return {'records': result['records']['current'], 'seconds': elapsed, 'submissions': result['submissions']}
+
+
+if __name__ == "__main__":
+    # python backup_diff.py <backup>          : compare le stockage actif et un backup
+    # python backup_diff.py --bench [quest.]  : mesure sur un journal synthétique
+    if len(sys.argv) > 1 and sys.argv[1] == "--bench":
+        result = benchmark(int(sys.argv[2]) if len(sys.argv) > 2 else 20000)
+        print(f"{result['records']} réponses comparées en {result['seconds']:.2f} s : {result['submissions']}")
+    elif len(sys.argv) > 1:
+        print(json.dumps(diff_backup(os.path.join(backups.BACKUP_DIR, sys.argv[1])), indent=4, ensure_ascii=False))
@@ -0,0 +1,690 @@
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import zipfile
+import zlib
+from contextlib import ExitStack, contextmanager
+from datetime import datetime
+
+from storage import (COMMIT_MARKER, HISTORY_LOG_FILE, LEGACY_HISTORY_FILE, QUESTIONS_FILE, RESPONSES_DIR,
+                     USERS_FILE, convert_legacy_history, get_storage)
+from writer import atomic_write_json, file_lock, get_write_queue
+
+BACKUP_DIR = "database/backups"
+BACKUP_HISTORY_FILE = os.path.join(BACKUP_DIR, "backup_history.json")
+# Catalogue maintenu à chaque backup : métadonnées, membres, nombre de réponses, empreintes
+CATALOG_FILE = os.path.join(BACKUP_DIR, "catalog.json")
+# Résumés par questionnaire des backups (comparaison), nommés par empreinte du backup
+DIGEST_DIR = os.path.join(BACKUP_DIR, "digests")
+# Blocs adressés par leur contenu : database/backups/chunks/ab/abcdef...
+CHUNK_DIR = os.path.join(BACKUP_DIR, "chunks")
+# Découpage à taille fixe : le journal étant en ajout seul, seul le dernier bloc change
+CHUNK_SIZE = 1024 * 1024
+MANIFEST_SUFFIX = ".manifest.json"
+# Taille des lectures lors d'une restauration (mémoire bornée quelle que soit la taille de l'historique)
+STREAM_BLOCK_SIZE = 1024 * 1024
+# Verrou sérialisant les restaurations concurrentes
+RESTORE_LOCK = os.path.join(BACKUP_DIR, "restore")
+
+# Début des lignes de validation du journal (ne sont pas des réponses)
+COMMIT_PREFIX = json.dumps({COMMIT_MARKER: ""})[:-3].encode()
+
+# Compression rapide : les données JSON se compressent déjà très bien au niveau 1
+COMPRESS_LEVEL = 1
+
+# Politique de rétention par défaut
+KEEP_FULL = 5
+KEEP_INCREMENTAL = 30
+
+# Backups planifiés : intervalle en secondes et/ou nombre de nouveaux questionnaires (0 = désactivé)
+SCHEDULE_INTERVAL = int(os.environ.get("TAZRIGT_BACKUP_INTERVAL", 24 * 3600))
+SCHEDULE_EVERY_SUBMISSIONS = int(os.environ.get("TAZRIGT_BACKUP_EVERY", 100))
+SCHEDULE_MODE = os.environ.get("TAZRIGT_BACKUP_MODE", "incremental")
+SCHEDULE_CHECK = 60
+SCHEDULER_LOCK = os.path.join(BACKUP_DIR, "scheduler")
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def data_files():
+    """Fichiers de données sauvegardés"""
+    return [QUESTIONS_FILE, HISTORY_LOG_FILE, USERS_FILE]
+
+
+def is_backup(filename):
+    """Indique si un nom de fichier du dossier correspond à un backup (ZIP ou incrémental)"""
+    return filename.startswith("backup_") and (filename.endswith(".zip") or filename.endswith(MANIFEST_SUFFIX))
+
+
+def read_history():
+    """Lit l'historique des backups"""
+    try:
+        with open(BACKUP_HISTORY_FILE, "r", encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return []
+
+
+def _append_history(entries):
+    """Ajoute des entrées à l'historique (appelé par le thread écrivain, sous verrou)"""
+    history = read_history()
+    history.extend(entries)
+    atomic_write_json(BACKUP_HISTORY_FILE, history)
+
+
+def _catalog_totals(backups):
+    """Statistiques globales du catalogue"""
+    return {
+        'count': len(backups),
+        'size': sum(e['size'] for e in backups.values()),
+        'logical_size': sum(e.get('logical_size', e['size']) for e in backups.values()),
+        'last_date': max((e['date'] for e in backups.values()), default=None),
+    }
+
+
+def _write_catalog(catalog):
+    """Écrit le catalogue en recalculant ses totaux"""
+    catalog['totals'] = _catalog_totals(catalog['backups'])
+    atomic_write_json(CATALOG_FILE, catalog)
+
+
+def _append_catalog(entries):
+    """Ajoute des backups au catalogue (appelé par le thread écrivain, sous verrou)"""
+    catalog = _load_catalog()
+    for entry in entries:
+        catalog['backups'][entry['filename']] = entry
+    _write_catalog(catalog)
+
+
+def _record_history(entry):
+    """Programme l'ajout d'un backup à l'historique et au catalogue ; retourne un Future
+
+    L'historique garde l'entrée sans le détail des membres, le catalogue
+    garde tout. Le Future est résolu quand les deux fichiers sont écrits.
+    """
+    queue = get_write_queue()
+    history_entry = {k: v for k, v in entry.items() if k not in ('members', 'sha256')}
+    queue.submit(BACKUP_HISTORY_FILE, [history_entry], _append_history)
+    return queue.submit(CATALOG_FILE, [entry], _append_catalog)
+
+
+class MemberStats:
+    """Taille, empreinte SHA-256 et nombre de réponses d'un fichier, calculés au fil de la lecture"""
+
+    def __init__(self, name):
+        self.count_records = name.endswith(".jsonl")
+        self.digest = hashlib.sha256()
+        self.size = 0
+        self.records = 0
+        self._pending = b""
+
+    def update(self, data):
+        self.digest.update(data)
+        self.size += len(data)
+        if self.count_records:
+            lines = (self._pending + data).split(b"\n")
+            self._pending = lines.pop()
+            self.records += sum(1 for line in lines if line.strip() and not line.startswith(COMMIT_PREFIX))
+
+    def result(self):
+        if self.count_records and self._pending.strip() and not self._pending.startswith(COMMIT_PREFIX):
+            self.records += 1
+            self._pending = b""
+        stats = {'size': self.size, 'sha256': self.digest.hexdigest()}
+        if self.count_records:
+            stats['records'] = self.records
+        return stats
+
+
+def file_checksum(path):
+    """Empreinte SHA-256 d'un fichier, lu par blocs"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for data in iter(lambda: f.read(STREAM_BLOCK_SIZE), b""):
+            digest.update(data)
+    return digest.hexdigest()
+
+
+@contextmanager
+def snapshot_files():
+    """Ouvre les fichiers de données dans un état cohérent : {nom: (fichier, taille)}
+
+    Les verrous des fichiers ne sont tenus que le temps de les ouvrir et de
+    relever leur taille. Le journal étant en ajout seul, ses premiers octets
+    ne changent plus ; les autres fichiers sont remplacés atomiquement, le
+    descripteur ouvert garde donc leur version au moment de l'instantané.
+    """
+    files = [f for f in data_files() if os.path.exists(f)]
+    with ExitStack() as handles:
+        snapshot = {}
+        with ExitStack() as locks:
+            for file in files:
+                locks.enter_context(file_lock(file))
+            for file in files:
+                handle = handles.enter_context(open(file, "rb"))
+                snapshot[os.path.basename(file)] = (handle, os.fstat(handle.fileno()).st_size)
+        yield snapshot
+
+
+def _read_blocks(handle, size, block_size):
+    """Lit les size premiers octets d'un fichier par blocs"""
+    while size > 0:
+        data = handle.read(min(block_size, size))
+        if not data:
+            return
+        size -= len(data)
+        yield data
+
+
+def _chunk_path(digest):
+    """Chemin d'un bloc à partir de son empreinte"""
+    return os.path.join(CHUNK_DIR, digest[:2], digest)
+
+
+def _store_chunk(data):
+    """Enregistre un bloc compressé s'il n'existe pas déjà ; retourne (empreinte, octets écrits)"""
+    digest = hashlib.sha256(data).hexdigest()
+    path = _chunk_path(digest)
+    if os.path.exists(path):
+        return digest, 0
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    compressed = zlib.compress(data, COMPRESS_LEVEL)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(compressed)
+    os.replace(temp_path, path)
+    return digest, len(compressed)
+
+
+def _read_chunk(digest):
+    """Relit un bloc et vérifie son empreinte"""
+    with open(_chunk_path(digest), "rb") as f:
+        data = zlib.decompress(f.read())
+    if hashlib.sha256(data).hexdigest() != digest:
+        raise ValueError(f"Bloc corrompu : {digest}")
+    return data
+
+
+def _backup_name(extension):
+    """Nom horodaté d'un nouveau backup (suffixé s'il en existe déjà un dans la même seconde)"""
+    stem = f"backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    name, n = f"{stem}{extension}", 1
+    while os.path.exists(os.path.join(BACKUP_DIR, name)):
+        name, n = f"{stem}_{n}{extension}", n + 1
+    return name
+
+
+def _last_backup(mode):
+    """Nom du backup le plus récent d'un type donné"""
+    entries = [e for e in read_history() if e.get('mode', 'full') == mode]
+    return entries[-1]['filename'] if entries else None
+
+
+def create_full_backup(created_by, submissions=None):
+    """Crée une archive ZIP complète des fichiers de données"""
+    backup_filename = _backup_name(".zip")
+    backup_path = os.path.join(BACKUP_DIR, backup_filename)
+    logical_size = 0
+    members = {}
+    with snapshot_files() as snapshot, \
+            zipfile.ZipFile(backup_path, 'w', zipfile.ZIP_DEFLATED, compresslevel=COMPRESS_LEVEL) as zf:
+        for name, (handle, size) in snapshot.items():
+            stats = MemberStats(name)
+            with zf.open(name, 'w') as member:
+                for data in _read_blocks(handle, size, STREAM_BLOCK_SIZE):
+                    stats.update(data)
+                    member.write(data)
+            members[name] = stats.result()
+            logical_size += size
+
+    return backup_path, {
+        "date": datetime.now().isoformat(),
+        "filename": backup_filename,
+        "size": os.path.getsize(backup_path),
+        "logical_size": logical_size,
+        "path": backup_path,
+        "mode": "full",
+        "submissions": submissions,
+        "created_by": created_by,
+        "sha256": file_checksum(backup_path),
+        "members": members
+    }
+
+
+def create_incremental_backup(created_by, submissions=None):
+    """Crée un backup incrémental : manifeste + blocs nouveaux uniquement
+
+    Chaque fichier est découpé en blocs adressés par leur contenu ; les blocs
+    déjà présents (backups précédents) ne sont pas réécrits. Le manifeste
+    suffit à reconstituer tous les fichiers.
+    """
+    backup_filename = _backup_name(MANIFEST_SUFFIX)
+    backup_path = os.path.join(BACKUP_DIR, backup_filename)
+    manifest = {
+        "mode": "incremental",
+        "date": datetime.now().isoformat(),
+        "parent": _last_backup("incremental"),
+        "chunk_size": CHUNK_SIZE,
+        "files": {}
+    }
+    stored = 0
+    logical_size = 0
+    members = {}
+    # Verrou partagé avec compact_chunks : un bloc écrit ne peut pas être purgé avant son manifeste
+    with snapshot_files() as snapshot, file_lock(CHUNK_DIR):
+        for name, (handle, size) in snapshot.items():
+            stats = MemberStats(name)
+            chunks = []
+            for data in _read_blocks(handle, size, CHUNK_SIZE):
+                stats.update(data)
+                chunk, written = _store_chunk(data)
+                chunks.append(chunk)
+                stored += written
+            members[name] = stats.result()
+            manifest["files"][name] = {
+                "size": size,
+                "sha256": members[name]['sha256'],
+                "chunks": chunks
+            }
+            logical_size += size
+        atomic_write_json(backup_path, manifest)
+    stored += os.path.getsize(backup_path)
+
+    return backup_path, {
+        "date": manifest["date"],
+        "filename": backup_filename,
+        "size": stored,
+        "logical_size": logical_size,
+        "path": backup_path,
+        "mode": "incremental",
+        "parent": manifest["parent"],
+        "submissions": submissions,
+        "created_by": created_by,
+        "sha256": file_checksum(backup_path),
+        "members": members
+    }
+
+
+def submission_count():
+    """Nombre de questionnaires enregistrés (sert au déclenchement des backups planifiés)"""
+    return len(get_storage().submission_ids())
+
+
+def create_backup(created_by, mode="full", wait=True):
+    """Crée un backup complet (ZIP) ou incrémental après export du stockage actif
+
+    L'entrée d'historique passe par la file d'écriture ; avec wait=False
+    l'appelant n'attend pas qu'elle soit sur disque.
+    """
+    os.makedirs(BACKUP_DIR, exist_ok=True)
+    # Mettre à jour les fichiers JSON depuis le stockage actif (SQLite)
+    get_storage().export_to_files()
+    submissions = submission_count()
+    if mode == "incremental":
+        backup_path, entry = create_incremental_backup(created_by, submissions)
+    else:
+        backup_path, entry = create_full_backup(created_by, submissions)
+    future = _record_history(entry)
+    if wait:
+        future.result()
+    return backup_path
+
+
+def read_manifest(backup_path):
+    """Lit le manifeste d'un backup incrémental"""
+    with open(backup_path, "r", encoding='utf-8') as f:
+        return json.load(f)
+
+
+def iter_backup_files(backup_path):
+    """Parcourt les fichiers d'un backup sans les extraire : (nom, itérateur de blocs d'octets)
+
+    Les membres d'une archive ZIP sont lus par blocs (CRC vérifié en fin de
+    lecture) ; ceux d'un backup incrémental sont reconstitués bloc par bloc
+    puis comparés à leur empreinte.
+    """
+    if backup_path.endswith(".zip"):
+        with zipfile.ZipFile(backup_path, 'r') as zip_ref:
+            for member in zip_ref.infolist():
+                if member.is_dir():
+                    continue
+
+                def blocks(member=member):
+                    with zip_ref.open(member) as f:
+                        while True:
+                            data = f.read(STREAM_BLOCK_SIZE)
+                            if not data:
+                                return
+                            yield data
+
+                # Nom brut : restore_destination refuse les chemins (../, sous-dossiers)
+                yield member.filename, blocks()
+        return
+
+    manifest = read_manifest(backup_path)
+    for name, entry in manifest["files"].items():
+
+        def blocks(entry=entry, name=name):
+            digest = hashlib.sha256()
+            for chunk in entry["chunks"]:
+                data = _read_chunk(chunk)
+                digest.update(data)
+                yield data
+            if digest.hexdigest() != entry["sha256"]:
+                raise ValueError(f"Empreinte invalide pour {name}")
+
+        yield name, blocks()
+
+
+def restore_destination(name):
+    """Emplacement de restauration d'un fichier de backup
+
+    Les noms viennent de l'archive ou du manifeste : seul un nom de fichier
+    simple est accepté, un chemin ("../", sous-dossier) lève ValueError.
+    """
+    if (not name or name in (".", "..") or os.path.basename(name) != name
+            or "\\" in name or "\0" in name):
+        raise ValueError(f"Nom de fichier refusé : {name!r}")
+    if name == os.path.basename(USERS_FILE):
+        return USERS_FILE
+    return os.path.join(RESPONSES_DIR, name)
+
+
+def _validate_lines(blocks):
+    """Vérifie au fil de l'eau que chaque ligne d'un journal NDJSON est un JSON valide"""
+    pending = b""
+    line_number = 0
+    for data in blocks:
+        lines = (pending + data).split(b"\n")
+        pending = lines.pop()
+        for line in lines:
+            line_number += 1
+            if line.strip():
+                try:
+                    json.loads(line)
+                except json.JSONDecodeError as e:
+                    raise ValueError(f"ligne {line_number} invalide : {e}")
+        yield data
+    if pending.strip():
+        json.loads(pending)
+
+
+def _stream_to_temp(name, blocks, dest_path):
+    """Écrit un fichier restauré dans un fichier temporaire propre à l'opération, en le validant"""
+    directory = os.path.dirname(dest_path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(prefix=f".{name}.", suffix=".restore", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            if name.endswith(".jsonl"):
+                blocks = _validate_lines(blocks)
+            for data in blocks:
+                f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        if not name.endswith(".jsonl"):
+            # Questions et utilisateurs : petits documents JSON validés en une fois
+            with open(temp_path, "r", encoding='utf-8') as f:
+                json.load(f)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+    return temp_path
+
+
+def _install(temp_path, dest_path):
+    """Conserve l'ancien fichier en .bak puis remplace atomiquement par le fichier restauré"""
+    with file_lock(dest_path):
+        if os.path.exists(dest_path):
+            backup_path = f"{dest_path}.bak"
+            if os.path.exists(backup_path):
+                os.remove(backup_path)
+            try:
+                os.link(dest_path, backup_path)
+            except OSError:
+                shutil.copy2(dest_path, backup_path)
+        os.replace(temp_path, dest_path)
+
+
+def restore_backup(backup_path):
+    """Restaure un backup (ZIP ou incrémental) en flux, fichier par fichier
+
+    Chaque fichier est écrit et validé dans un fichier temporaire unique
+    voisin de sa destination, puis substitué atomiquement : deux restaurations
+    ne se marchent pas dessus et un fichier invalide ne remplace rien.
+    Retourne (fichiers restaurés, erreurs {fichier: message}).
+    """
+    restored_files = []
+    errors = {}
+    with file_lock(RESTORE_LOCK):
+        # Partir de fichiers JSON à jour pour ceux que le backup ne contient pas
+        get_storage().export_to_files()
+
+        for name, blocks in iter_backup_files(backup_path):
+            try:
+                dest_path = restore_destination(name)
+                temp_path = _stream_to_temp(name, blocks, dest_path)
+                # Un ancien backup contient l'historique au format JSON : converti en journal,
+                # puis installé comme les autres fichiers (.bak du journal courant, sous son verrou)
+                if dest_path == LEGACY_HISTORY_FILE:
+                    legacy_path = temp_path
+                    try:
+                        temp_path = convert_legacy_history(legacy_path)
+                    finally:
+                        os.remove(legacy_path)
+                    dest_path = HISTORY_LOG_FILE
+            except Exception as e:
+                errors[name] = str(e)
+                continue
+            _install(temp_path, dest_path)
+            restored_files.append(name)
+
+        # Recharger les fichiers restaurés dans le stockage actif (SQLite)
+        get_storage().import_from_files()
+    return restored_files, errors
+
+
+def _scan_backup(filename, history_entry=None):
+    """Décrit un backup existant en le relisant (reconstruction du catalogue uniquement)"""
+    path = os.path.join(BACKUP_DIR, filename)
+    members = {}
+    for name, blocks in iter_backup_files(path):
+        stats = MemberStats(name)
+        for data in blocks:
+            stats.update(data)
+        members[name] = stats.result()
+        # Ancien format : l'historique est un tableau JSON
+        if name == os.path.basename(LEGACY_HISTORY_FILE):
+            with zipfile.ZipFile(path) as zf:
+                members[name]['records'] = len(json.loads(zf.read(name)))
+    entry = dict(history_entry or {})
+    entry.setdefault("date", datetime.fromtimestamp(os.path.getmtime(path)).isoformat())
+    entry.setdefault("mode", "incremental" if filename.endswith(MANIFEST_SUFFIX) else "full")
+    entry.setdefault("created_by", None)
+    entry.update({
+        "filename": filename,
+        "path": path,
+        "size": os.path.getsize(path),
+        "logical_size": sum(m['size'] for m in members.values()),
+        "sha256": file_checksum(path),
+        "members": members
+    })
+    if entry["mode"] == "incremental":
+        # Espace réel inconnu après coup : on garde la taille notée à la création si elle existe
+        entry["size"] = (history_entry or {}).get("size", entry["size"])
+    return entry
+
+
+def _scan_catalog():
+    """Construit le catalogue en relisant tous les backups présents"""
+    history = {e['filename']: e for e in read_history()}
+    names = [f for f in os.listdir(BACKUP_DIR) if is_backup(f)] if os.path.exists(BACKUP_DIR) else []
+    entries = [_scan_backup(name, history.get(name)) for name in names]
+    return {'backups': {e['filename']: e for e in sorted(entries, key=lambda e: e['date'])}}
+
+
+def rebuild_catalog():
+    """Reconstruit le catalogue à partir des backups présents (par exemple après une copie manuelle)"""
+    with file_lock(CATALOG_FILE):
+        catalog = _scan_catalog()
+        _write_catalog(catalog)
+    return catalog
+
+
+def _load_catalog():
+    """Lit le catalogue, le construit s'il n'existe pas (l'appelant détient le verrou du catalogue)"""
+    try:
+        with open(CATALOG_FILE, "r", encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        catalog = _scan_catalog()
+        _write_catalog(catalog)
+        return catalog
+
+
+def read_catalog():
+    """Lit le catalogue des backups (le construit une fois s'il n'existe pas encore)"""
+    try:
+        with open(CATALOG_FILE, "r", encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        # Reconstruction sous le verrou des écritures du catalogue : pas de course avec create_backup
+        with file_lock(CATALOG_FILE):
+            return _load_catalog()
+
+
+def list_backups(catalog=None):
+    """Noms des backups disponibles, du plus récent au plus ancien"""
+    catalog = catalog or read_catalog()
+    return list(reversed(catalog['backups']))
+
+
+def apply_retention(keep_full=KEEP_FULL, keep_incremental=KEEP_INCREMENTAL):
+    """Supprime les backups les plus anciens au-delà de la politique de rétention
+
+    Retourne la liste des backups supprimés ; les blocs qui ne sont plus
+    référencés sont libérés par compact_chunks().
+    """
+    with file_lock(BACKUP_HISTORY_FILE):
+        history = read_history()
+        keep = {}
+        for entry in reversed(history):
+            mode = entry.get('mode', 'full')
+            limit = keep_incremental if mode == "incremental" else keep_full
+            keep[mode] = keep.get(mode, 0) + 1
+            entry['_keep'] = keep[mode] <= limit
+
+        removed = []
+        for entry in history:
+            if not entry.pop('_keep'):
+                path = os.path.join(BACKUP_DIR, entry['filename'])
+                if os.path.exists(path):
+                    os.remove(path)
+                removed.append(entry['filename'])
+        atomic_write_json(BACKUP_HISTORY_FILE, [e for e in history if e['filename'] not in removed])
+
+    with file_lock(CATALOG_FILE):
+        catalog = _load_catalog()
+        for filename in removed:
+            entry = catalog['backups'].pop(filename, None)
+            digest_path = os.path.join(DIGEST_DIR, f"{(entry or {}).get('sha256')}.json")
+            if os.path.exists(digest_path):
+                os.remove(digest_path)
+        _write_catalog(catalog)
+    return removed
+
+
+def compact_chunks():
+    """Supprime les blocs qui ne sont référencés par aucun manifeste ; retourne les octets libérés"""
+    freed = 0
+    if not os.path.exists(CHUNK_DIR):
+        return freed
+    with file_lock(CHUNK_DIR):
+        referenced = set()
+        for name in os.listdir(BACKUP_DIR):
+            if is_backup(name) and name.endswith(MANIFEST_SUFFIX):
+                for entry in read_manifest(os.path.join(BACKUP_DIR, name))["files"].values():
+                    referenced.update(entry["chunks"])
+
+        for prefix in os.listdir(CHUNK_DIR):
+            prefix_dir = os.path.join(CHUNK_DIR, prefix)
+            for chunk in os.listdir(prefix_dir):
+                if chunk not in referenced:
+                    path = os.path.join(prefix_dir, chunk)
+                    freed += os.path.getsize(path)
+                    os.remove(path)
+    return freed
+
+
+def backup_due(history=None, now=None, interval=None, every=None):
+    """Indique si un backup planifié est dû (intervalle écoulé ou assez de nouveaux questionnaires)"""
+    history = read_history() if history is None else history
+    interval = SCHEDULE_INTERVAL if interval is None else interval
+    every = SCHEDULE_EVERY_SUBMISSIONS if every is None else every
+    if not history:
+        return True
+    last = history[-1]
+    now = now or datetime.now()
+    if interval and (now - datetime.fromisoformat(last['date'])).total_seconds() >= interval:
+        return True
+    if every and last.get('submissions') is not None:
+        return submission_count() - last['submissions'] >= every
+    return False
+
+
+def run_scheduled_backup(mode=None):
+    """Crée un backup si nécessaire ; sûr entre processus (serveur et démon). Retourne le chemin ou None"""
+    os.makedirs(BACKUP_DIR, exist_ok=True)
+    with file_lock(SCHEDULER_LOCK):
+        if not backup_due():
+            return None
+        # Attendre l'historique avant de rendre le verrou : un autre planificateur verra ce backup
+        path = create_backup("planificateur", mode=mode or SCHEDULE_MODE, wait=True)
+        # Politique de rétention après chaque backup planifié : les backups sans surveillance ne s'accumulent pas
+        apply_retention()
+        compact_chunks()
+        return path
+
+
+def start_scheduler(check_every=SCHEDULE_CHECK):
+    """Démarre (une seule fois par processus) le planificateur de backups en arrière-plan"""
+    global _scheduler
+    if not (SCHEDULE_INTERVAL or SCHEDULE_EVERY_SUBMISSIONS):
+        return
+
+    def run():
+        while True:
+            time.sleep(check_every)
+            try:
+                run_scheduled_backup()
+            except Exception as e:
+                print(f"Backup planifié en échec : {e}", file=sys.stderr)
+
+    # Appelé par chaque session : un seul thread même si plusieurs pages s'ouvrent en même temps
+    with _scheduler_lock:
+        if _scheduler is not None and _scheduler.is_alive():
+            return
+        _scheduler = threading.Thread(target=run, name="backup-scheduler", daemon=True)
+        _scheduler.start()
+
+
+if __name__ == "__main__":
+    # python backups.py daemon                   : planificateur au premier plan
+    # python backups.py once [full|incremental]  : un backup immédiat
+    command = sys.argv[1] if len(sys.argv) > 1 else "daemon"
+    if command == "once":
+        print(create_backup("cli", mode=sys.argv[2] if len(sys.argv) > 2 else "full"))
+    else:
+        print(f"Planificateur : toutes les {SCHEDULE_INTERVAL} s ou {SCHEDULE_EVERY_SUBMISSIONS} questionnaires "
+              f"({SCHEDULE_MODE})", flush=True)
+        while True:
+            path = run_scheduled_backup()
+            if path:
+                print(f"{datetime.now().isoformat()} {path}", flush=True)
+            time.sleep(SCHEDULE_CHECK)
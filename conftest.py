@@ -0,0 +1 @@
+# Racine du dépôt : les tests importent les modules de l'application (storage, backups...)
@@ -3,6 +3,7 @@ import json
 import os
 from typing import Dict
 from auth import require_auth
+from writer import atomic_write_json, get_write_queue
 
 # Configuration de la page (doit être en premier)
 st.set_page_config(page_title="Administration - Questionnaire Marketing", layout="wide")
@@ -27,13 +28,34 @@ def load_questions() -> Dict:
         }
     }
 
+def write_questions_file(data: Dict):
+    """Écrit le fichier des questions (appelé par le thread écrivain, sous verrou)"""
+    atomic_write_json("questions.json", data)
+
 def save_questions(data: Dict):
     """Sauvegarde les questions dans un fichier JSON"""
-    with open("questions.json", "w", encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=4)
+    get_write_queue().write("questions.json", data, write_questions_file, mode="replace")
+
+def update_field(target: Dict, field: str, value, label: str):
+    """Modifie un champ uniquement si sa valeur change et le marque comme à sauvegarder"""
+    if target.get(field) != value:
+        target[field] = value
+        dirty_fields.append(label)
+
+def flush_changes() -> int:
+    """Sauvegarde en une seule écriture les modifications en attente ; retourne le nombre d'écritures"""
+    if not dirty_fields:
+        return 0
+    save_questions(questions_data)
+    dirty_fields.clear()
+    st.session_state.admin_write_count = st.session_state.get('admin_write_count', 0) + 1
+    return 1
 
 questions_data = load_questions()
 
+# Champs modifiés pendant ce rendu : une seule écriture à la fin du script
+dirty_fields = []
+
 with st.expander("📁 Gestion des Groupes", expanded=True):
     col1, col2 = st.columns(2)
     with col1:
@@ -41,7 +63,8 @@ with st.expander("📁 Gestion des Groupes", expanded=True):
         if st.button("➕ Ajouter Groupe") and new_group_name:
             new_key = f"G{len(questions_data)+1}"
             questions_data[new_key] = {"title": new_group_name, "questions": {}}
-            save_questions(questions_data)
+            dirty_fields.append(new_key)
+            flush_changes()
             st.rerun()
     
     with col2:
@@ -53,7 +76,8 @@ with st.expander("📁 Gestion des Groupes", expanded=True):
         if st.button("🗑️ Supprimer Groupe"):
             group_key = group_to_delete.split(" - ")[0]
             del questions_data[group_key]
-            save_questions(questions_data)
+            dirty_fields.append(group_key)
+            flush_changes()
             st.rerun()
 
 for group_key, group_data in questions_data.items():
@@ -63,9 +87,7 @@ for group_key, group_data in questions_data.items():
             value=group_data['title'],
             key=f"group_title_{group_key}"
         )
-        if new_title != group_data['title']:
-            group_data['title'] = new_title
-            save_questions(questions_data)
+        update_field(group_data, 'title', new_title, f"{group_key}.title")
 
         st.markdown("### Ajouter une Question")
         new_q_col1, new_q_col2 = st.columns([4, 1])
@@ -98,7 +120,8 @@ for group_key, group_data in questions_data.items():
                     "default": None if new_q_default == "Aucun" else new_q_default,
                     "coef": new_q_coef
                 }
-                save_questions(questions_data)
+                dirty_fields.append(f"{group_key}.{q_key}")
+                flush_changes()
                 st.rerun()
 
         st.markdown("### Questions Existantes")
@@ -114,9 +137,7 @@ for group_key, group_data in questions_data.items():
                         key=f"q_text_{group_key}_{q_key}",
                         height=100
                     )
-                    if new_text != q_data['text']:
-                        q_data['text'] = new_text
-                        save_questions(questions_data)
+                    update_field(q_data, 'text', new_text, f"{group_key}.{q_key}.text")
                 
                 with cols[1]:
                     new_default = st.selectbox(
@@ -125,8 +146,8 @@ for group_key, group_data in questions_data.items():
                         index=0 if q_data['default'] is None else 1 if q_data['default'] == "Oui" else 2,
                         key=f"q_default_{group_key}_{q_key}"
                     )
-                    q_data['default'] = None if new_default == "Aucun" else new_default
-                    save_questions(questions_data)
+                    update_field(q_data, 'default', None if new_default == "Aucun" else new_default,
+                                 f"{group_key}.{q_key}.default")
                 
                 with cols[2]:
                     new_coef = st.number_input(
@@ -137,11 +158,50 @@ for group_key, group_data in questions_data.items():
                         step=0.1,
                         key=f"q_coef_{group_key}_{q_key}"
                     )
-                    q_data['coef'] = new_coef
-                    save_questions(questions_data)
+                    update_field(q_data, 'coef', new_coef, f"{group_key}.{q_key}.coef")
                 
                 with cols[3]:
                     if st.button("🗑️", key=f"del_{group_key}_{q_key}"):
                         del group_data['questions'][q_key]
-                        save_questions(questions_data)
-                        st.rerun() 
\ No newline at end of file
+                        dirty_fields.append(f"{group_key}.{q_key}")
+                        flush_changes()
+                        st.rerun()
+
+def report_job_panel():
+    """Avancement puis résultat de la génération des rapports en arrière-plan"""
+    import reports
+    job = reports.report_job_status()
+    if job['running']:
+        st.progress(job['done'] / (job['total'] or 1), text=f"{job['done']}/{job['total']} — {job['client'] or '…'}")
+        return
+    if st.session_state.pop('reports_polling', False):
+        # Lot terminé : une exécution complète arrête le rafraîchissement périodique
+        st.rerun()
+    if job.get('error'):
+        st.error(f"Génération interrompue : {job['error']}")
+    elif job.get('summary'):
+        summary = job['summary']
+        st.success(f"{summary['generated']} rapport(s) générés, {summary['skipped']} déjà à jour")
+        for failure in summary['failed']:
+            st.error(f"{failure['client']} : {failure['error']}")
+        with open(job['zip'], "rb") as f:
+            st.download_button("📥 Télécharger l'archive", f.read(), file_name="rapports_clients.zip",
+                               mime="application/zip", key="reports_download")
+
+with st.expander("📄 Rapports PDF par client"):
+    import reports
+    st.caption("Génère un rapport par client ; les clients dont les réponses n'ont pas changé sont ignorés.")
+    force_reports = st.checkbox("Régénérer tous les rapports", key="reports_force")
+    if st.button("Générer les rapports", key="reports_generate"):
+        if not reports.start_report_job(force=force_reports):
+            st.info("Une génération est déjà en cours")
+    # Génération dans un thread d'arrière-plan : seul ce fragment est rafraîchi pendant le lot
+    st.session_state.reports_polling = reports.report_job_status()['running']
+    st.fragment(report_job_panel, run_every=1 if st.session_state.reports_polling else None)()
+
+# Persister les modifications de ce rendu (aucune écriture si rien n'a changé)
+writes_this_render = flush_changes()
+st.sidebar.caption(
+    f"💾 Écritures disque : {writes_this_render} pour ce rendu, "
+    f"{st.session_state.get('admin_write_count', 0)} depuis l'ouverture de la session"
+)
@@ -1,10 +1,8 @@
 import streamlit as st
-import json
 import os
-import shutil
 from datetime import datetime
-import zipfile
 from auth import require_auth
+import backups
 import base64
 from io import BytesIO
 import pandas as pd
@@ -22,99 +20,24 @@ os.makedirs("database/users", exist_ok=True)
 
 st.title("🔄 Backup & Restore")
 
-def create_backup():
-    """Crée une archive ZIP contenant tous les fichiers de données"""
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    backup_filename = f"backup_{timestamp}.zip"
-    backup_path = os.path.join("database/backups", backup_filename)
-    
-    # Liste des fichiers à sauvegarder
-    files_to_backup = [
-        "database/responses/questions.json",
-        "database/responses/responses_history.json",
-        "database/users/users.json"
-    ]
-    
-    # Créer un fichier ZIP
-    with zipfile.ZipFile(backup_path, 'w', zipfile.ZIP_DEFLATED) as zf:
-        for file in files_to_backup:
-            if os.path.exists(file):
-                zf.write(file, os.path.basename(file))
-    
-    # Sauvegarder dans l'historique
-    history_file = "database/backups/backup_history.json"
-    if not os.path.exists(history_file):
-        backup_history = []
-    else:
-        with open(history_file, "r") as f:
-            backup_history = json.load(f)
-    
-    backup_size = os.path.getsize(backup_path)
-    backup_history.append({
-        "date": datetime.now().isoformat(),
-        "filename": backup_filename,
-        "size": backup_size,
-        "path": backup_path,
-        "created_by": st.session_state.username
-    })
-    
-    with open(history_file, "w") as f:
-        json.dump(backup_history, f, indent=4)
-    
-    return backup_path
+def create_backup(mode="full"):
+    """Crée un backup complet (archive ZIP) ou incrémental (blocs dédupliqués)"""
+    return backups.create_backup(st.session_state.username, mode=mode)
 
 def restore_backup(backup_path):
-    """Restaure les données depuis une archive ZIP"""
-    with zipfile.ZipFile(backup_path, 'r') as zip_ref:
-        # Créer un dossier temporaire pour la restauration
-        temp_dir = "temp_restore"
-        os.makedirs(temp_dir, exist_ok=True)
-        
-        # Extraire les fichiers
-        zip_ref.extractall(temp_dir)
-        
-        # Vérifier et déplacer les fichiers
-        restored_files = []
-        for file in os.listdir(temp_dir):
-            source = os.path.join(temp_dir, file)
-            try:
-                # Vérifier si le fichier est un JSON valide
-                with open(source, 'r', encoding='utf-8') as f:
-                    json.load(f)
-                
-                # Déterminer le dossier de destination
-                if file == 'users.json':
-                    dest_folder = "database/users"
-                else:
-                    dest_folder = "database/responses"
-                
-                # Créer une sauvegarde du fichier existant
-                dest_path = os.path.join(dest_folder, file)
-                if os.path.exists(dest_path):
-                    backup_name = f"{file}.bak"
-                    shutil.copy2(dest_path, os.path.join(dest_folder, backup_name))
-                
-                # Déplacer le fichier
-                shutil.move(source, dest_path)
-                restored_files.append(file)
-            except (json.JSONDecodeError, Exception) as e:
-                st.error(f"Erreur lors de la restauration de {file}: {str(e)}")
-        
-        # Nettoyer le dossier temporaire
-        shutil.rmtree(temp_dir)
-        
-        return restored_files
+    """Restaure les données depuis une archive ZIP ou un backup incrémental"""
+    restored_files, errors = backups.restore_backup(backup_path)
+    for file, error in errors.items():
+        st.error(f"Erreur lors de la restauration de {file}: {error}")
+    return restored_files, errors
 
 def get_backup_info(backup_path):
-    """Récupère les informations sur le contenu du backup"""
-    info = {}
-    with zipfile.ZipFile(backup_path, 'r') as zip_ref:
-        for file in zip_ref.namelist():
-            info[file] = {
-                'size': zip_ref.getinfo(file).file_size,
-                'date': datetime.fromtimestamp(zip_ref.getinfo(file).date_time[0:6]).isoformat()
-            }
-    return info
+    """Récupère les informations sur le contenu du backup (depuis le catalogue)"""
+    entry = backups.read_catalog()['backups'].get(os.path.basename(backup_path), {})
+    return {
+        file: {**member, 'date': entry.get('date')}
+        for file, member in entry.get('members', {}).items()
+    }
 
 # Interface utilisateur
 tabs = st.tabs(["Backup", "Restore", "Historique des Backups"])
@@ -130,13 +53,23 @@ with tabs[0]:
     Le backup sera automatiquement :
     1. Créé dans le dossier database/backups
     2. Enregistré dans l'historique
-    3. Téléchargé sur votre ordinateur
+    3. Téléchargé sur votre ordinateur (backup complet)
+    
+    Un backup incrémental n'enregistre que les blocs de données nouveaux
+    depuis les backups précédents.
     """)
     
+    backup_mode = st.radio(
+        "Type de backup",
+        ["full", "incremental"],
+        format_func=lambda m: "Complet (archive ZIP)" if m == "full" else "Incrémental (blocs dédupliqués)",
+        horizontal=True
+    )
+    
     if st.button("🔄 Créer un Nouveau Backup"):
         with st.spinner("Création du backup en cours..."):
             try:
-                backup_path = create_backup()
+                backup_path = create_backup(backup_mode)
                 # Téléchargement automatique
                 with open(backup_path, "rb") as f:
                     backup_data = f.read()
@@ -146,20 +79,21 @@ with tabs[0]:
                 backup_info = get_backup_info(backup_path)
                 st.json(backup_info)
                 
-                # Créer le bouton de téléchargement et le cliquer automatiquement
-                st.markdown(
-                    f"""
-                    <script>
-                        const link = document.createElement('a');
-                        link.href = URL.createObjectURL(new Blob([{backup_data}], {{type: 'application/zip'}}));
-                        link.download = "{os.path.basename(backup_path)}";
-                        document.body.appendChild(link);
-                        link.click();
-                        document.body.removeChild(link);
-                    </script>
-                    """,
-                    unsafe_allow_html=True
-                )
+                # Un backup incrémental dépend des blocs du serveur : pas de téléchargement
+                if backup_mode == "full":
+                    st.markdown(
+                        f"""
+                        <script>
+                            const link = document.createElement('a');
+                            link.href = URL.createObjectURL(new Blob([{backup_data}], {{type: 'application/zip'}}));
+                            link.download = "{os.path.basename(backup_path)}";
+                            document.body.appendChild(link);
+                            link.click();
+                            document.body.removeChild(link);
+                        </script>
+                        """,
+                        unsafe_allow_html=True
+                    )
             except Exception as e:
                 st.error(f"Erreur lors de la création du backup : {str(e)}")
 
@@ -167,24 +101,20 @@ with tabs[1]:
     st.header("📥 Restaurer un Backup")
     st.warning("⚠️ La restauration écrasera les données actuelles. Une sauvegarde des fichiers existants sera créée automatiquement.")
     
-    # Liste des backups disponibles
-    backup_files = []
-    backup_dir = "database/backups"
-    if os.path.exists(backup_dir):
-        backup_files = [f for f in os.listdir(backup_dir) if f.endswith('.zip')]
+    # Liste des backups disponibles (catalogue, du plus récent au plus ancien)
+    backup_dir = backups.BACKUP_DIR
+    catalog = backups.read_catalog()
+    backup_files = backups.list_backups(catalog)
     
     if not backup_files:
         st.info("Aucun backup disponible")
     else:
-        # Trier les backups par date (le plus récent en premier)
-        backup_files.sort(key=lambda x: os.path.getmtime(os.path.join(backup_dir, x)), reverse=True)
-        
         col1, col2 = st.columns([3, 1])
         with col1:
             selected_backup = st.selectbox(
                 "Sélectionner un backup à restaurer",
                 backup_files,
-                format_func=lambda x: f"{x} ({datetime.fromtimestamp(os.path.getmtime(os.path.join(backup_dir, x))).strftime('%Y-%m-%d %H:%M:%S')})"
+                format_func=lambda x: f"{x} ({datetime.fromisoformat(catalog['backups'][x]['date']).strftime('%Y-%m-%d %H:%M:%S')})"
             )
         
         with col2:
@@ -200,54 +130,80 @@ with tabs[1]:
                         st.json(backup_info)
                         
                         # Restaurer les fichiers
-                        restored_files = restore_backup(backup_path)
-                        st.success(f"✅ Restauration réussie! Fichiers restaurés : {', '.join(restored_files)}")
-                        st.info("ℹ️ Veuillez rafraîchir la page pour voir les changements.")
+                        restored_files, errors = restore_backup(backup_path)
+                        if not errors:
+                            st.success(f"✅ Restauration réussie! Fichiers restaurés : {', '.join(restored_files)}")
+                            st.info("ℹ️ Veuillez rafraîchir la page pour voir les changements.")
+                        elif restored_files:
+                            st.warning(f"Restauration partielle : {', '.join(restored_files)}")
                     except Exception as e:
                         st.error(f"❌ Erreur lors de la restauration : {str(e)}")
 
 with tabs[2]:
     st.header("📋 Historique des Backups")
     
-    history_file = "database/backups/backup_history.json"
+    history_file = backups.BACKUP_HISTORY_FILE
     if os.path.exists(history_file):
-        with open(history_file, "r") as f:
-            history = json.load(f)
+        history = backups.read_history()
         
         if history:
             # Créer un DataFrame pour l'affichage
             history_df = pd.DataFrame(history)
             history_df['date'] = pd.to_datetime(history_df['date']).dt.strftime('%Y-%m-%d %H:%M:%S')
             history_df['size'] = history_df['size'].apply(lambda x: f"{x/1024:.1f} KB")
+            if 'mode' not in history_df.columns:
+                history_df['mode'] = "full"
+            history_df['mode'] = history_df['mode'].fillna("full").map({'full': "Complet", 'incremental': "Incrémental"})
             
-            # Ajouter des statistiques
+            # Ajouter des statistiques (totaux tenus à jour dans le catalogue)
+            totals = backups.read_catalog()['totals']
             st.subheader("📊 Statistiques")
-            col1, col2, col3 = st.columns(3)
+            col1, col2, col3, col4 = st.columns(4)
             
             with col1:
-                st.metric("Nombre total de backups", len(history))
+                st.metric("Nombre total de backups", totals['count'])
             
             with col2:
-                avg_size = sum(float(s.replace(" KB", "")) for s in history_df['size']) / len(history)
+                avg_size = totals['size'] / 1024 / totals['count'] if totals['count'] else 0
                 st.metric("Taille moyenne", f"{avg_size:.1f} KB")
             
             with col3:
-                last_backup = datetime.strptime(history_df['date'].iloc[-1], '%Y-%m-%d %H:%M:%S')
-                days_since = (datetime.now() - last_backup).days
-                st.metric("Dernier backup", f"Il y a {days_since} jours")
+                if totals['last_date']:
+                    days_since = (datetime.now() - datetime.fromisoformat(totals['last_date'])).days
+                    st.metric("Dernier backup", f"Il y a {days_since} jours")
+            
+            with col4:
+                st.metric("Espace économisé", f"{(totals['logical_size'] - totals['size'])/1024:.1f} KB",
+                          help="Taille des données sauvegardées moins l'espace disque occupé (déduplication et compression)")
             
             # Afficher l'historique
             st.subheader("📜 Historique Complet")
             st.dataframe(
-                history_df[['date', 'filename', 'size', 'created_by']].rename(columns={
+                history_df[['date', 'filename', 'mode', 'size', 'created_by']].rename(columns={
                     'date': 'Date',
                     'filename': 'Nom du fichier',
+                    'mode': 'Type',
                     'size': 'Taille',
                     'created_by': 'Créé par'
                 }),
                 hide_index=True,
                 use_container_width=True
             )
+            
+            # Rétention et compaction
+            st.subheader("🧹 Rétention")
+            col1, col2, col3 = st.columns([1, 1, 1])
+            with col1:
+                keep_full = st.number_input("Backups complets conservés", min_value=1, value=backups.KEEP_FULL)
+            with col2:
+                keep_incremental = st.number_input("Backups incrémentaux conservés", min_value=1,
+                                                   value=backups.KEEP_INCREMENTAL)
+            with col3:
+                st.markdown("###")  # Pour aligner le bouton
+                if st.button("Appliquer la rétention"):
+                    removed = backups.apply_retention(keep_full, keep_incremental)
+                    freed = backups.compact_chunks()
+                    st.success(f"{len(removed)} backup(s) supprimé(s), {freed/1024:.1f} KB de blocs libérés")
         else:
             st.info("Aucun historique de backup disponible")
     else:
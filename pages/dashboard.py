@@ -1,11 +1,14 @@
 import streamlit as st
 import pandas as pd
-import json
 import os
 from datetime import datetime
 import plotly.express as px
 import plotly.graph_objects as go
 from auth import require_auth, is_admin
+import storage
+import aggregates
+from response_stats import progress_stats
+from response_frame import load_response_frame
 import numpy as np
 from io import BytesIO
 
@@ -15,56 +18,17 @@ st.set_page_config(page_title="Dashboard - Questionnaire Marketing", layout="wid
 # Vérifier l'authentification
 require_auth()
 
-def load_responses():
-    """Charge l'historique des réponses"""
-    try:
-        with open("database/responses/responses_history.json", "r", encoding='utf-8') as f:
-            return json.load(f)
-    except FileNotFoundError:
-        return []
+# Un utilisateur ne voit que ses propres réponses
+current_user = None if is_admin() else st.session_state.username
 
-def load_questions():
-    """Charge les questions"""
-    try:
-        with open("database/responses/questions.json", "r", encoding='utf-8') as f:
-            return json.load(f)
-    except FileNotFoundError:
-        return []
+# Valeurs disponibles pour les filtres (sans charger l'historique)
+facets = storage.response_facets(username=current_user)
+questions = storage.load_questions()
 
-def process_responses(responses_history, current_user):
-    """Traite les réponses pour créer un DataFrame avec filtrage par utilisateur"""
-    if not responses_history:
-        return pd.DataFrame()
-
-    # Les réponses sont déjà dans le bon format, on peut les convertir directement
-    df = pd.DataFrame(responses_history)
-    
-    # S'assurer que toutes les colonnes nécessaires existent
-    required_columns = ['client_name', 'date', 'group', 'question', 'response', 'comment', 'user']
-    for col in required_columns:
-        if col not in df.columns:
-            df[col] = ''
-    
-    # Filtrer par utilisateur si ce n'est pas un admin
-    if not is_admin():
-        df = df[df['user'] == current_user]
-    
-    # Calculer le coefficient (1 pour Oui, 0 pour Non)
-    df['coefficient'] = (df['response'] == 'Oui').astype(int)
-    
-    return df
-
-# Charger les données
-responses_history = load_responses()
-questions = load_questions()
-
-if not responses_history:
+if not facets['count']:
     st.warning("⚠️ Aucune réponse n'a encore été enregistrée.")
     st.stop()
 
-# Convertir l'historique en DataFrame avec filtrage par utilisateur
-df_responses = process_responses(responses_history, st.session_state.username)
-
 # Sidebar pour les filtres
 st.sidebar.header("🔍 Filtres")
 
@@ -75,39 +39,43 @@ else:
     st.sidebar.info(f"👤 Utilisateur: {st.session_state.username}")
 
 # Filtre par client
-clients = sorted(df_responses['client_name'].unique())
+clients = facets['clients']
 selected_client = st.sidebar.selectbox(
     "Sélectionner un client",
     ["Tous les clients"] + list(clients)
 )
 
 # Filtre par date
-df_responses['date'] = pd.to_datetime(df_responses['date'])
-dates = df_responses['date'].dt.date.unique()
 start_date = st.sidebar.date_input(
     "Date de début",
-    min(dates)
+    datetime.fromisoformat(facets['min_date']).date()
 )
 end_date = st.sidebar.date_input(
     "Date de fin",
-    max(dates)
+    datetime.fromisoformat(facets['max_date']).date()
 )
 
 # Filtre par utilisateur (uniquement pour les admins)
+selected_user = "Tous les utilisateurs"
 if is_admin():
-    users = sorted(df_responses['user'].unique())
+    users = facets['users']
     selected_user = st.sidebar.selectbox(
         "Sélectionner un utilisateur",
         ["Tous les utilisateurs"] + list(users)
     )
 
-# Appliquer les filtres
-mask = df_responses['date'].dt.date.between(start_date, end_date)
-if selected_client != "Tous les clients":
-    mask &= (df_responses['client_name'] == selected_client)
-if is_admin() and selected_user != "Tous les utilisateurs":
-    mask &= (df_responses['user'] == selected_user)
-filtered_df = df_responses[mask]
+# Appliquer les filtres directement dans la requête de stockage
+filters = dict(
+    client_name=None if selected_client == "Tous les clients" else selected_client,
+    username=current_user if current_user else (None if selected_user == "Tous les utilisateurs" else selected_user),
+    start_date=start_date,
+    end_date=end_date
+)
+filtered_df = load_response_frame(**filters)
+
+# Compteurs agrégés : les statistiques ne parcourent pas les réponses brutes
+counts = aggregates.counts_frame(storage.load_counts(**filters))
+metrics = aggregates.summary_metrics(counts)
 
 # Layout principal
 st.title("📊 Dashboard Analytics")
@@ -122,20 +90,16 @@ else:
 col1, col2, col3, col4 = st.columns(4)
 
 with col1:
-    total_responses = len(filtered_df)
-    st.metric("Total Réponses", total_responses)
+    st.metric("Total Réponses", metrics['total'])
 
 with col2:
-    unique_clients = filtered_df['client_name'].nunique()
-    st.metric("Nombre de Clients", unique_clients)
+    st.metric("Nombre de Clients", metrics['clients'])
 
 with col3:
-    positive_rate = (filtered_df['response'] == 'Oui').mean() * 100
-    st.metric("Taux de Réponses Positives", f"{positive_rate:.1f}%")
+    st.metric("Taux de Réponses Positives", f"{metrics['positive_rate']:.1f}%")
 
 with col4:
-    avg_score = filtered_df['coefficient'].mean() * 100
-    st.metric("Score Moyen", f"{avg_score:.1f}%")
+    st.metric("Score Moyen", f"{metrics['score'] * 100:.1f}%")
 
 # Créer les onglets
 tab1, tab2, tab3 = st.tabs(["📊 Vue d'ensemble", "📝 Analyse détaillée", "💬 Commentaires"])
@@ -143,7 +107,7 @@ tab1, tab2, tab3 = st.tabs(["📊 Vue d'ensemble", "📝 Analyse détaillée", "
 with tab1:
     # Graphique des réponses par groupe
     st.subheader("Répartition des réponses par groupe")
-    response_by_group = filtered_df.groupby(['group', 'response']).size().unstack(fill_value=0)
+    response_by_group = aggregates.response_by_group(counts)
     
     fig = px.bar(
         response_by_group,
@@ -156,38 +120,20 @@ with tab1:
     
     # Tableau des statistiques
     st.subheader("Statistiques par groupe")
-    stats_by_group = filtered_df.groupby('group').agg({
-        'response': [
-            ('Total', 'count'),
-            ('Oui', lambda x: (x == 'Oui').sum()),
-            ('Non', lambda x: (x == 'Non').sum()),
-            ('% Oui', lambda x: (x == 'Oui').mean() * 100)
-        ]
-    }).round(1)
-    stats_by_group.columns = stats_by_group.columns.droplevel()
+    stats_by_group = aggregates.group_stats(counts)
     st.dataframe(stats_by_group, use_container_width=True)
 
 with tab2:
     # Sélection du groupe
     selected_group = st.selectbox(
         "Sélectionner un groupe",
-        filtered_df['group'].unique()
+        stats_by_group.index
     )
     
-    group_data = filtered_df[filtered_df['group'] == selected_group]
-    
     # Analyse par question
     st.subheader(f"Analyse des questions - {selected_group}")
     
-    question_stats = group_data.groupby('question').agg({
-        'response': [
-            ('Total', 'count'),
-            ('Oui', lambda x: (x == 'Oui').sum()),
-            ('Non', lambda x: (x == 'Non').sum()),
-            ('% Oui', lambda x: (x == 'Oui').mean() * 100)
-        ]
-    }).round(1)
-    question_stats.columns = question_stats.columns.droplevel()
+    question_stats = aggregates.question_stats(counts, selected_group)
     
     # Graphique
     fig_questions = px.bar(
@@ -276,27 +222,20 @@ with tabs[0]:
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        total_responses = len(filtered_df)
-        st.metric("Total Réponses", total_responses)
+        st.metric("Total Réponses", metrics['total'])
     
     with col2:
-        avg_score = filtered_df['coefficient'].mean()
-        st.metric("Score Moyen Global", f"{avg_score:.2f}")
+        st.metric("Score Moyen Global", f"{metrics['score']:.2f}")
     
     with col3:
-        positive_rate = (filtered_df['response'] == 'Oui').mean() * 100
-        st.metric("Taux de Réponses Positives", f"{positive_rate:.1f}%")
+        st.metric("Taux de Réponses Positives", f"{metrics['positive_rate']:.1f}%")
     
     with col4:
-        unique_clients = filtered_df['client_name'].nunique()
-        st.metric("Nombre de Clients", unique_clients)
+        st.metric("Nombre de Clients", metrics['clients'])
 
     # Ajouter un graphique de tendance temporelle
     st.subheader("Évolution des Scores dans le Temps")
-    daily_scores = filtered_df.groupby(filtered_df['date'].dt.date).agg({
-        'coefficient': 'mean',
-        'response': lambda x: (x == 'Oui').mean() * 100
-    }).reset_index()
+    daily_scores = aggregates.daily_stats(counts)
     
     if not daily_scores.empty:
         fig_daily = go.Figure()
@@ -325,11 +264,9 @@ with tabs[1]:
     # Analyse par question
     st.markdown("### Analyse par Question")
     
-    question_stats = filtered_df.groupby(['group', 'question']).agg({
-        'response': lambda x: (x == 'Oui').mean() * 100,
-        'coefficient': 'mean',
-        'client_name': 'count'
-    }).reset_index()
+    question_stats = aggregates.question_stats(counts).reset_index()
+    question_stats['Score Moyen'] = question_stats['Oui'] / question_stats['Total']
+    question_stats = question_stats[['group', 'question', '% Oui', 'Score Moyen', 'Total']]
     
     question_stats.columns = ['Groupe', 'Question', 'Taux de Oui (%)', 'Score Moyen', 'Nombre de Réponses']
     st.dataframe(question_stats, use_container_width=True)
@@ -372,13 +309,7 @@ with tabs[3]:
     st.markdown("### Analyse des Tendances")
     
     # Tendances par groupe
-    trends_group = filtered_df.groupby([
-        pd.Grouper(key='date', freq='D'),
-        'group'
-    ]).agg({
-        'response': lambda x: (x == 'Oui').mean() * 100,
-        'coefficient': 'mean'
-    }).reset_index()
+    trends_group = aggregates.group_trends(counts)
     
     if not trends_group.empty:
         # Graphique des tendances
@@ -398,15 +329,7 @@ with tabs[3]:
         
         # Analyse de la progression
         st.subheader("Progression")
-        progress_df = trends_group.groupby('group').agg({
-            'response': ['first', 'last', lambda x: x.diff().mean()],
-            'coefficient': ['first', 'last', lambda x: x.diff().mean()]
-        }).round(2)
-        
-        progress_df.columns = [
-            'Taux Initial (%)', 'Taux Final (%)', 'Progression Moyenne (%)',
-            'Score Initial', 'Score Final', 'Progression Score'
-        ]
+        progress_df = progress_stats(trends_group)
         st.dataframe(progress_df, use_container_width=True)
     else:
         st.info("Pas assez de données pour afficher les tendances.") 
\ No newline at end of file
@@ -1,10 +1,12 @@
 import streamlit as st
 import pandas as pd
-import json
 import os
+import time
+from collections import deque
 from typing import Dict, List
 from datetime import datetime
 from auth import require_auth
+import storage
 
 # Configuration de la page
 st.set_page_config(page_title="Questionnaire Marketing", layout="wide")
@@ -12,42 +14,129 @@ st.set_page_config(page_title="Questionnaire Marketing", layout="wide")
 # Vérifier l'authentification
 require_auth()
 
+# Début de l'exécution complète de la page (mesure des temps de réponse)
+page_start = time.perf_counter()
+
 # Création des dossiers nécessaires
 os.makedirs("database/responses", exist_ok=True)
 
-def load_questions():
-    """Charge les questions depuis le fichier JSON"""
-    try:
-        with open("database/responses/questions.json", "r", encoding='utf-8') as f:
-            return json.load(f)
-    except FileNotFoundError:
-        return []
-
-def save_response(response_data):
-    """Sauvegarde une réponse dans l'historique"""
-    history_file = "database/responses/responses_history.json"
-    
-    # Charger l'historique existant
-    if os.path.exists(history_file):
-        with open(history_file, "r", encoding='utf-8') as f:
-            history = json.load(f)
-    else:
-        history = []
-    
-    # Ajouter la nouvelle réponse
-    history.append(response_data)
-    
-    # Sauvegarder l'historique mis à jour
-    with open(history_file, "w", encoding='utf-8') as f:
-        json.dump(history, f, indent=4, ensure_ascii=False)
+def save_responses(responses):
+    """Enregistre un questionnaire complet de façon atomique et retourne son identifiant"""
+    return storage.commit_submission(responses)
 
 def calculate_progress():
-    """Calcule la progression du questionnaire"""
+    """Calcule la progression du questionnaire (compteurs tenus à jour, sans parcours)"""
     if not st.session_state.get('responses'):
         return 0
-    total_questions = sum(len(group['questions']) for group in st.session_state.questions)
-    answered_questions = len(st.session_state.responses)
-    return int((answered_questions / total_questions) * 100)
+    return int((len(st.session_state.responses) / st.session_state.total_questions) * 100)
+
+def all_answered():
+    """Vérifie que toutes les questions ont une réponse"""
+    return len(st.session_state.responses) == st.session_state.total_questions
+
+def record_response(group_key, index, response_data):
+    """Enregistre ou remplace la réponse à une question (clé : groupe, numéro de question)"""
+    st.session_state.responses[(group_key, index)] = response_data
+
+def group_responses(group):
+    """Réponses d'un groupe dans l'ordre des questions"""
+    responses = st.session_state.responses
+    return [
+        responses[(group['key'], i)]
+        for i in range(len(group['questions']))
+        if (group['key'], i) in responses
+    ]
+
+def ordered_responses():
+    """Liste des réponses dans l'ordre du questionnaire (pour l'enregistrement)"""
+    return [response for group in st.session_state.questions for response in group_responses(group)]
+
+def record_latency(kind, seconds):
+    """Mémorise la durée d'une interaction (exécution de la page ou d'une seule question)"""
+    latencies = st.session_state.setdefault('latencies', {})
+    latencies.setdefault(kind, deque(maxlen=200)).append(seconds)
+
+def latency_summary():
+    """Nombre, moyenne, p95 et maximum (ms) des durées d'interaction par type"""
+    rows = []
+    labels = {'page': "Page complète", 'question': "Réponse à une question"}
+    for kind, values in st.session_state.get('latencies', {}).items():
+        ordered = sorted(values)
+        rows.append({
+            'Interaction': labels.get(kind, kind),
+            'Nombre': len(ordered),
+            'Moyenne (ms)': round(1000 * sum(ordered) / len(ordered), 1),
+            'p95 (ms)': round(1000 * ordered[int(0.95 * (len(ordered) - 1))], 1),
+            'Max (ms)': round(1000 * ordered[-1], 1),
+        })
+    return rows
+
+@st.fragment
+def latency_report():
+    """Affiche les temps de réponse mesurés côté serveur (actualisable sans relancer la page)"""
+    with st.expander("⏱️ Temps de réponse de l'interface"):
+        st.button("Actualiser", key="refresh_latency")
+        rows = latency_summary()
+        if rows:
+            st.dataframe(pd.DataFrame(rows), hide_index=True)
+        else:
+            st.info("Aucune mesure pour le moment.")
+
+@st.fragment
+def question_widget(group, index):
+    """Affiche une question et enregistre sa réponse
+
+    Fragment : un clic sur la réponse ou sur le commentaire ne relance que
+    cette question, pas la page entière.
+    """
+    start = time.perf_counter()
+    question = group['questions'][index]
+    st.markdown(f"**Q{index+1}. {question['text']}**")
+
+    # Créer une clé unique pour la question
+    question_key = f"{group['key']}_{index}"
+
+    # Afficher les options de réponse
+    col1, col2 = st.columns([3, 1])
+
+    with col1:
+        response = st.radio(
+            "Votre réponse:",
+            ["Oui", "Non"],
+            key=f"response_{question_key}",
+            horizontal=True
+        )
+
+    with col2:
+        # Bouton pour afficher/masquer le commentaire
+        if st.button("💬 Ajouter un commentaire", key=f"btn_{question_key}"):
+            st.session_state.show_comment[question_key] = not st.session_state.show_comment.get(question_key, False)
+
+    # Afficher le champ de commentaire si le bouton est cliqué
+    comment = ""
+    if st.session_state.show_comment.get(question_key, False):
+        comment = st.text_area(
+            "Votre commentaire:",
+            key=f"comment_{question_key}",
+            help="Ajoutez un commentaire pour expliquer votre réponse"
+        )
+
+    # Sauvegarder la réponse
+    record_response(group['key'], index, {
+        "date": datetime.now().isoformat(),
+        "username": st.session_state.username,
+        "client_name": st.session_state.client_name,
+        "group": group['key'],
+        "group_title": group['title'],
+        "question": question['text'],
+        "response": response,
+        "comment": comment
+    })
+
+    st.markdown("---")
+    # Pendant une exécution complète, la durée est comptée avec celle de la page
+    if not st.session_state.get('page_running'):
+        record_latency('question', time.perf_counter() - start)
 
 def display_summary():
     """Affiche le résumé des réponses avec un style amélioré"""
@@ -74,20 +163,19 @@ def display_summary():
     # En-tête du résumé
     st.markdown("<div class='summary-container'>", unsafe_allow_html=True)
     st.markdown("## 📊 Résumé du Questionnaire")
-    st.markdown(f"**Client:** {st.session_state.responses[0]['client_name']}")
+    st.markdown(f"**Client:** {next(iter(st.session_state.responses.values()))['client_name']}")
     st.markdown(f"**Date:** {datetime.now().strftime('%d/%m/%Y %H:%M')}")
+    if st.session_state.get('submission_id'):
+        st.markdown(f"**Référence:** `{st.session_state.submission_id}`")
     st.markdown("</div>", unsafe_allow_html=True)
 
     # Tableau des réponses par groupe
     for group in st.session_state.questions:
         st.markdown(f"### {group['title']}")
         
-        # Filtrer les réponses pour ce groupe
-        group_responses = [r for r in st.session_state.responses if r['group'] == group['key']]
-        
         # Créer le DataFrame pour ce groupe
         data = []
-        for response in group_responses:
+        for response in group_responses(group):
             data.append({
                 'Question': response['question'],
                 'Réponse': response['response'],
@@ -117,12 +205,11 @@ def display_summary():
         st.markdown("---")
 
     # Section des commentaires
-    comments_exist = any(r['comment'] for r in st.session_state.responses)
+    comments_exist = any(r['comment'] for r in st.session_state.responses.values())
     if comments_exist:
         st.markdown("## 💬 Commentaires Détaillés")
         for group in st.session_state.questions:
-            comments_in_group = [r for r in st.session_state.responses 
-                               if r['group'] == group['key'] and r['comment']]
+            comments_in_group = [r for r in group_responses(group) if r['comment']]
             if comments_in_group:
                 st.markdown(f"### {group['title']}")
                 for response in comments_in_group:
@@ -144,19 +231,22 @@ def display_summary():
 # Interface principale
 st.title("📝 Questionnaire Marketing")
 
-# Charger les questions
-questions = load_questions()
-if not questions:
-    st.warning("⚠️ Aucune question n'est configurée. Veuillez contacter l'administrateur.")
-    st.stop()
-
-# Initialiser les variables de session
+# Charger les questions (une seule fois par session)
 if 'questions' not in st.session_state:
+    questions = storage.load_questions()
+    if not questions:
+        st.warning("⚠️ Aucune question n'est configurée. Veuillez contacter l'administrateur.")
+        st.stop()
     st.session_state.questions = questions
+
+# Initialiser les variables de session
 if 'current_group' not in st.session_state:
     st.session_state.current_group = 0
 if 'responses' not in st.session_state:
-    st.session_state.responses = []
+    # Réponses en cours : {(clé du groupe, numéro de question): réponse}
+    st.session_state.responses = {}
+if 'total_questions' not in st.session_state:
+    st.session_state.total_questions = sum(len(group['questions']) for group in st.session_state.questions)
 if 'show_comment' not in st.session_state:
     st.session_state.show_comment = {}
 
@@ -179,64 +269,13 @@ if 'questionnaire_completed' not in st.session_state:
     st.subheader(f"📝 {current_group['title']}")
     st.markdown(current_group['description'])
 
-    # Afficher les questions du groupe
-    for i, question in enumerate(current_group['questions']):
-        st.markdown(f"**Q{i+1}. {question['text']}**")
-        
-        # Créer une clé unique pour la question
-        question_key = f"{current_group['key']}_{i}"
-        
-        # Afficher les options de réponse
-        col1, col2 = st.columns([3, 1])
-        
-        with col1:
-            response = st.radio(
-                "Votre réponse:",
-                ["Oui", "Non"],
-                key=f"response_{question_key}",
-                horizontal=True
-            )
-        
-        with col2:
-            # Bouton pour afficher/masquer le commentaire
-            if st.button("💬 Ajouter un commentaire", key=f"btn_{question_key}"):
-                st.session_state.show_comment[question_key] = not st.session_state.show_comment.get(question_key, False)
-        
-        # Afficher le champ de commentaire si le bouton est cliqué
-        comment = ""
-        if st.session_state.show_comment.get(question_key, False):
-            comment = st.text_area(
-                "Votre commentaire:",
-                key=f"comment_{question_key}",
-                help="Ajoutez un commentaire pour expliquer votre réponse"
-            )
-        
-        # Sauvegarder la réponse
-        response_data = {
-            "date": datetime.now().isoformat(),
-            "username": st.session_state.username,
-            "client_name": client_name,
-            "group": current_group['key'],
-            "group_title": current_group['title'],
-            "question": question['text'],
-            "response": response,
-            "comment": comment
-        }
-        
-        # Mettre à jour les réponses en session
-        # Vérifier si la réponse existe déjà
-        existing_response = next(
-            (i for i, r in enumerate(st.session_state.responses) 
-             if r['group'] == current_group['key'] and r['question'] == question['text']),
-            None
-        )
-        
-        if existing_response is not None:
-            st.session_state.responses[existing_response] = response_data
-        else:
-            st.session_state.responses.append(response_data)
-        
-        st.markdown("---")
+    # Afficher les questions du groupe (seul le groupe courant est construit)
+    st.session_state.page_running = True
+    for i in range(len(current_group['questions'])):
+        question_widget(current_group, i)
+    st.session_state.page_running = False
+    record_latency('page', time.perf_counter() - page_start)
+    latency_report()
 
     # Navigation entre les groupes
     col1, col2 = st.columns(2)
@@ -253,12 +292,10 @@ if 'questionnaire_completed' not in st.session_state:
                 st.rerun()
         else:
             # Vérifier que toutes les questions ont une réponse
-            total_questions = sum(len(group['questions']) for group in st.session_state.questions)
-            if len(st.session_state.responses) == total_questions:
+            if all_answered():
                 if st.button("✅ Terminer le questionnaire"):
-                    # Sauvegarder toutes les réponses
-                    for response in st.session_state.responses:
-                        save_response(response)
+                    # Sauvegarder toutes les réponses en une seule écriture
+                    st.session_state.submission_id = save_responses(ordered_responses())
                     st.session_state.questionnaire_completed = True
                     st.rerun()
             else:
@@ -274,7 +311,7 @@ else:
     
     # Bouton pour recommencer
     if st.button("🔄 Commencer un nouveau questionnaire"):
-        for key in ['responses', 'current_group', 'show_comment', 'questionnaire_completed']:
+        for key in ['responses', 'total_questions', 'current_group', 'show_comment', 'questionnaire_completed', 'submission_id']:
             if key in st.session_state:
                 del st.session_state[key]
         st.rerun() 
\ No newline at end of file
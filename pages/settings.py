@@ -1,8 +1,9 @@
 import streamlit as st
-import json
 import os
 from datetime import datetime
 from auth import require_auth, hash_password
+import sessions
+import storage
 
 # Configuration de la page
 st.set_page_config(page_title="Paramètres - Questionnaire Marketing", layout="wide")
@@ -13,19 +14,21 @@ require_auth(role="admin")
 # Création du dossier database si nécessaire
 os.makedirs("database/users", exist_ok=True)
 
+@st.cache_resource
+def default_admin_password():
+    """Mot de passe haché de l'administrateur par défaut (haché une fois par processus)"""
+    return hash_password("admin123")
+
 def load_users():
     """Charge la liste des utilisateurs"""
-    users_file = "database/users/users.json"
-    if os.path.exists(users_file):
-        with open(users_file, "r", encoding='utf-8') as f:
-            return json.load(f)
-    return {"admin": {"password": hash_password("admin123"), "role": "admin"}}
+    users = storage.load_users()
+    if users:
+        return users
+    return {"admin": {"password": default_admin_password(), "role": "admin"}}
 
 def save_users(users):
     """Sauvegarde la liste des utilisateurs"""
-    users_file = "database/users/users.json"
-    with open(users_file, "w", encoding='utf-8') as f:
-        json.dump(users, f, indent=4, ensure_ascii=False)
+    storage.save_users(users)
 
 st.title("⚙️ Paramètres")
 
@@ -83,6 +86,7 @@ with tabs[0]:
         else:
             del users[user_to_delete]
             save_users(users)
+            sessions.invalidate_user(user_to_delete)
             st.success(f"Utilisateur {user_to_delete} supprimé avec succès!")
             st.rerun()
     
@@ -97,6 +101,8 @@ with tabs[0]:
             users[user_to_modify]["password"] = hash_password(new_password)
             users[user_to_modify]["last_modified"] = datetime.now().isoformat()
             save_users(users)
+            # Les autres sessions ouvertes avec l'ancien mot de passe sont fermées
+            sessions.invalidate_user(user_to_modify, keep_token=st.session_state.session_token)
             st.success(f"Mot de passe modifié pour {user_to_modify}!")
 
 with tabs[1]:
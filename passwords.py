@@ -0,0 +1,302 @@
+import base64
+import hashlib
+import hmac
+import json
+import os
+import re
+import secrets
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import storage
+from writer import atomic_write_json
+
+# Algorithme des nouveaux mots de passe : "pbkdf2_sha256" ou "scrypt"
+PASSWORD_HASHER = os.environ.get("TAZRIGT_PASSWORD_HASHER", "pbkdf2_sha256")
+# Durée visée pour une vérification (ms) lors de l'étalonnage
+LOGIN_BUDGET_MS = int(os.environ.get("TAZRIGT_LOGIN_BUDGET_MS", "250"))
+# Coûts retenus par l'étalonnage sur cette machine (non sauvegardé : propre au matériel)
+CALIBRATION_FILE = "database/users/password_hashing.json"
+SALT_BYTES = 16
+
+_LEGACY_SHA256 = re.compile(r"^[0-9a-f]{64}$")
+
+
+def _b64(data):
+    """Base64 sans remplissage"""
+    return base64.b64encode(data).decode('ascii').rstrip("=")
+
+
+def _unb64(text):
+    """Décode le base64 sans remplissage"""
+    return base64.b64decode(text + "=" * (-len(text) % 4))
+
+
+class PBKDF2Hasher:
+    """PBKDF2-HMAC-SHA256 : pbkdf2_sha256$<itérations>$<sel>$<empreinte>"""
+
+    algorithm = "pbkdf2_sha256"
+    minimum_cost = {'iterations': 100000}
+
+    def derive(self, password, salt, cost):
+        """Empreinte brute du mot de passe"""
+        return hashlib.pbkdf2_hmac("sha256", password.encode('utf-8'), salt, cost['iterations'])
+
+    def encode(self, password, salt, cost):
+        """Mot de passe haché au format enregistré"""
+        return f"{self.algorithm}${cost['iterations']}${_b64(salt)}${_b64(self.derive(password, salt, cost))}"
+
+    def decode(self, encoded):
+        """Coûts, sel et empreinte d'un mot de passe enregistré"""
+        _, iterations, salt, digest = encoded.split("$")
+        return {'iterations': int(iterations)}, _unb64(salt), _unb64(digest)
+
+    def calibrate(self, budget_ms):
+        """Nombre d'itérations tenant dans le budget
+
+        Mesure sur 20 000 itérations, extrapolée, puis corrigée par une mesure
+        au coût retenu (l'extrapolation seule dépasse souvent le budget).
+        """
+        probe = {'iterations': 20000}
+        elapsed = min(_time_derive(self, probe) for _ in range(3))
+        iterations = int(probe['iterations'] * budget_ms / 1000 / elapsed)
+        for _ in range(3):
+            measured = min(_time_derive(self, {'iterations': iterations}) for _ in range(2))
+            if measured * 1000 <= budget_ms:
+                break
+            iterations = int(iterations * budget_ms / 1000 / measured * 0.95)
+        iterations = iterations // 1000 * 1000
+        return {'iterations': max(iterations, self.minimum_cost['iterations'])}
+
+
+class ScryptHasher:
+    """scrypt : scrypt$<n>$<r>$<p>$<sel>$<empreinte>"""
+
+    algorithm = "scrypt"
+    minimum_cost = {'n': 2 ** 14, 'r': 8, 'p': 1}
+    # Mémoire maximale par vérification (plusieurs connexions simultanées)
+    max_memory = 64 * 1024 * 1024
+
+    def derive(self, password, salt, cost):
+        """Empreinte brute du mot de passe"""
+        return hashlib.scrypt(password.encode('utf-8'), salt=salt, n=cost['n'], r=cost['r'], p=cost['p'],
+                              maxmem=2 * self.max_memory, dklen=32)
+
+    def encode(self, password, salt, cost):
+        """Mot de passe haché au format enregistré"""
+        digest = self.derive(password, salt, cost)
+        return f"{self.algorithm}${cost['n']}${cost['r']}${cost['p']}${_b64(salt)}${_b64(digest)}"
+
+    def decode(self, encoded):
+        """Coûts, sel et empreinte d'un mot de passe enregistré"""
+        _, n, r, p, salt, digest = encoded.split("$")
+        return {'n': int(n), 'r': int(r), 'p': int(p)}, _unb64(salt), _unb64(digest)
+
+    def calibrate(self, budget_ms):
+        """Plus grand n (puissance de 2) tenant dans le budget et la limite mémoire"""
+        cost = dict(self.minimum_cost)
+        while 128 * cost['n'] * 2 * cost['r'] <= self.max_memory:
+            candidate = {**cost, 'n': cost['n'] * 2}
+            if _time_derive(self, candidate) * 1000 > budget_ms:
+                break
+            cost = candidate
+        return cost
+
+
+HASHERS = {hasher.algorithm: hasher for hasher in (PBKDF2Hasher(), ScryptHasher())}
+
+
+def _time_derive(hasher, cost):
+    """Durée (s) d'une dérivation avec les coûts donnés"""
+    start = time.perf_counter()
+    hasher.derive("étalonnage", secrets.token_bytes(SALT_BYTES), cost)
+    return time.perf_counter() - start
+
+
+_calibration = None
+_calibration_lock = threading.Lock()
+
+
+def read_calibration():
+    """Coûts étalonnés par algorithme ({} si l'étalonnage n'a jamais été fait)"""
+    global _calibration
+    with _calibration_lock:
+        if _calibration is None:
+            try:
+                with open(CALIBRATION_FILE, "r", encoding='utf-8') as f:
+                    _calibration = json.load(f)
+            except (FileNotFoundError, json.JSONDecodeError):
+                _calibration = {}
+        return _calibration
+
+
+# Un seul étalonnage à la fois (premier hachage du processus)
+_first_calibration_lock = threading.Lock()
+
+
+def current_cost(algorithm=None):
+    """Coûts appliqués aux nouveaux mots de passe
+
+    Sans étalonnage enregistré, la machine est étalonnée à la première
+    utilisation et le résultat est conservé : les coûts par défaut peuvent
+    dépasser le budget de connexion sur un serveur modeste.
+    """
+    hasher = HASHERS[algorithm or PASSWORD_HASHER]
+    entry = read_calibration().get(hasher.algorithm)
+    if entry is None:
+        with _first_calibration_lock:
+            entry = read_calibration().get(hasher.algorithm) or calibrate(algorithm=hasher.algorithm)
+    return entry['cost']
+
+
+def calibrate(budget_ms=LOGIN_BUDGET_MS, algorithm=None):
+    """Étalonne les coûts pour qu'une vérification dure environ budget_ms sur cette machine
+
+    Le résultat est enregistré dans CALIBRATION_FILE ; les mots de passe existants
+    seront re-hachés avec les nouveaux coûts à leur prochaine connexion.
+    """
+    global _calibration
+    hasher = HASHERS[algorithm or PASSWORD_HASHER]
+    cost = hasher.calibrate(budget_ms)
+    measured = min(_time_derive(hasher, cost) for _ in range(3))
+    entry = {
+        'cost': cost,
+        'budget_ms': budget_ms,
+        'measured_ms': round(measured * 1000, 1),
+        'calibrated_at': datetime.now().isoformat(),
+    }
+    with _calibration_lock:
+        calibration = dict(_calibration or {})
+        calibration[hasher.algorithm] = entry
+        atomic_write_json(CALIBRATION_FILE, calibration)
+        _calibration = calibration
+    return {'algorithm': hasher.algorithm, **entry}
+
+
+def hash_password(password, algorithm=None):
+    """Hache un mot de passe avec un sel aléatoire et les coûts courants"""
+    hasher = HASHERS[algorithm or PASSWORD_HASHER]
+    return hasher.encode(password, secrets.token_bytes(SALT_BYTES), current_cost(hasher.algorithm))
+
+
+def identify(encoded):
+    """Algorithme d'un mot de passe enregistré : nom du hacheur, "sha256" ou "plain" (anciens formats)"""
+    algorithm = (encoded or "").split("$", 1)[0]
+    if algorithm in HASHERS:
+        return algorithm
+    if _LEGACY_SHA256.match(encoded or ""):
+        return "sha256"
+    return "plain"
+
+
+def verify_password(password, encoded):
+    """Vérifie un mot de passe (comparaison à temps constant), y compris les anciens formats"""
+    if not encoded:
+        return False
+    algorithm = identify(encoded)
+    if algorithm in HASHERS:
+        hasher = HASHERS[algorithm]
+        try:
+            cost, salt, digest = hasher.decode(encoded)
+        except ValueError:
+            return False
+        return hmac.compare_digest(hasher.derive(password, salt, cost), digest)
+    # Anciens formats : SHA-256 sans sel (page Paramètres) ou texte clair (users.json initial)
+    if algorithm == "sha256":
+        return hmac.compare_digest(encoded, hashlib.sha256(password.encode('utf-8')).hexdigest())
+    return hmac.compare_digest(encoded.encode('utf-8'), password.encode('utf-8'))
+
+
+def needs_rehash(encoded):
+    """Indique si un mot de passe enregistré doit être re-haché (ancien format ou coûts différents)"""
+    algorithm = identify(encoded)
+    if algorithm != PASSWORD_HASHER:
+        return True
+    try:
+        cost = HASHERS[algorithm].decode(encoded)[0]
+    except ValueError:
+        return True
+    return cost != current_cost(algorithm)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Pool de vérification : les dérivations (hashlib libère le GIL) s'exécutent en parallèle"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=os.cpu_count() or 1, thread_name_prefix="password")
+        return _pool
+
+
+# Mot de passe factice : un nom d'utilisateur inconnu coûte autant qu'un mot de passe faux
+_dummy_hash = None
+
+
+def check_password(password, encoded):
+    """Vérifie un mot de passe dans le pool de vérification (None : utilisateur inconnu)"""
+    global _dummy_hash
+    if encoded is None:
+        if _dummy_hash is None:
+            _dummy_hash = hash_password(secrets.token_hex(8))
+        get_pool().submit(verify_password, password, _dummy_hash).result()
+        return False
+    return get_pool().submit(verify_password, password, encoded).result()
+
+
+_rehash_lock = threading.Lock()
+
+
+def _rehash(username, password, encoded):
+    """Remplace le mot de passe enregistré s'il n'a pas été modifié entre-temps"""
+    new_encoded = hash_password(password)
+    with _rehash_lock:
+        users = storage.load_users()
+        user = users.get(username)
+        if user is None or user.get("password") != encoded:
+            return False
+        user["password"] = new_encoded
+        storage.save_users(users)
+    return True
+
+
+def schedule_rehash(username, password, encoded):
+    """Migre en arrière-plan un mot de passe vérifié vers l'algorithme et les coûts courants"""
+    if needs_rehash(encoded):
+        return get_pool().submit(_rehash, username, password, encoded)
+    return None
+
+
+def benchmark(logins=32):
+    """Mesure une rafale de connexions simultanées avec les coûts courants"""
+    encoded = hash_password("motdepasse")
+    single = min(_time_derive(HASHERS[PASSWORD_HASHER], current_cost()) for _ in range(3))
+    start = time.perf_counter()
+    futures = [get_pool().submit(verify_password, "motdepasse", encoded) for _ in range(logins)]
+    ok = all(f.result() for f in futures)
+    elapsed = time.perf_counter() - start
+    return {
+        'algorithm': PASSWORD_HASHER,
+        'cost': current_cost(),
+        'verify_ms': round(single * 1000, 1),
+        'budget_ms': LOGIN_BUDGET_MS,
+        'burst_logins': logins,
+        'burst_seconds': round(elapsed, 2),
+        'workers': get_pool()._max_workers,
+        'ok': ok,
+    }
+
+
+if __name__ == "__main__":
+    # python passwords.py calibrate [budget_ms] : étalonne et enregistre les coûts
+    # python passwords.py [connexions]          : mesure une rafale de connexions
+    if len(sys.argv) > 1 and sys.argv[1] == "calibrate":
+        print(json.dumps(calibrate(int(sys.argv[2]) if len(sys.argv) > 2 else LOGIN_BUDGET_MS), indent=4))
+    else:
+        print(json.dumps(benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 32), indent=4))
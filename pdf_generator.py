@@ -1,5 +1,13 @@
-import matplotlib.pyplot as plt
-import numpy as np
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from functools import lru_cache, partial
+from itertools import chain, islice
+from xml.sax.saxutils import escape
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
 from reportlab.lib.pagesizes import A4
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image, PageBreak, Table, TableStyle
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
@@ -8,134 +16,371 @@ from reportlab.lib import colors
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
 from reportlab.lib.utils import ImageReader
+from reportlab.graphics.shapes import Drawing, String
+from reportlab.graphics.charts.piecharts import Pie
+from reportlab.graphics.charts.barcharts import VerticalBarChart
 from io import BytesIO
 from datetime import datetime
 import matplotlib
 matplotlib.use('Agg')
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
 
-def create_header_footer(canvas, doc):
-    """Ajoute l'en-tête et le pied de page sur chaque page"""
-    width, height = A4
-    
-    # En-tête
-    canvas.saveState()
-    canvas.setFillColor(colors.navy)
-    canvas.rect(0, height - 2.5*cm, width, 2.5*cm, fill=True)
-    canvas.setFillColor(colors.white)
-    canvas.setFont("Helvetica-Bold", 16)
-    canvas.drawString(1*cm, height - 1.7*cm, "Rapport d'Analyse Marketing")
-    canvas.drawString(width - 5*cm, height - 1.7*cm, datetime.now().strftime("%d/%m/%Y"))
-    
-    # Pied de page
-    canvas.setFillColor(colors.navy)
-    canvas.rect(0, 0, width, 1.5*cm, fill=True)
-    canvas.setFillColor(colors.white)
-    canvas.setFont("Helvetica", 8)
-    canvas.drawString(1*cm, 0.7*cm, f"Page {doc.page}")
-    canvas.drawString(width - 7*cm, 0.7*cm, "Rapport généré automatiquement")
-    canvas.restoreState()
-
-def create_pie_chart(responses, title):
-    """Crée un graphique circulaire des réponses"""
-    yes_count = sum(1 for v in responses.values() if v == "Oui")
-    no_count = sum(1 for v in responses.values() if v == "Non")
-    
-    plt.figure(figsize=(8, 6))
-    plt.pie([yes_count, no_count], 
-            labels=['Oui', 'Non'],
-            colors=['#2ecc71', '#e74c3c'],
-            autopct='%1.1f%%',
-            startangle=90)
-    plt.title(title, pad=20, fontsize=12)
+# Cache des graphiques PNG partagé par tous les rapports du processus
+CHART_CACHE_SIZE = 256
+_chart_cache = OrderedDict()
+_chart_cache_lock = threading.Lock()
+_chart_pool = None
+_chart_pool_lock = threading.Lock()
+
+# Lignes par sous-tableau du récapitulatif (environ une page A4)
+SUMMARY_CHUNK_ROWS = 20
+SUMMARY_COL_WIDTHS = [4*cm, 9.5*cm, 2.2*cm, 2.3*cm]
+
+class ReportTemplate:
+    """Gabarit de rapport réutilisable : styles précompilés, en-tête/pied de page et horodatage
+
+    Un même gabarit peut servir à tous les rapports d'une génération : les
+    feuilles de style ne sont construites qu'une fois et tous les rapports
+    portent la même date de génération.
+    """
+
+    def __init__(self, generated_at=None, title="Rapport d'Analyse Marketing"):
+        self.generated_at = generated_at or datetime.now()
+        self.title = title
+        self.header_date = self.generated_at.strftime("%d/%m/%Y")
+        self.generation_text = f"Date de génération : {self.generated_at.strftime('%d/%m/%Y à %H:%M')}"
+        
+        self.styles = getSampleStyleSheet()
+        self.styles.add(ParagraphStyle(
+            name='CustomTitle',
+            parent=self.styles['Heading1'],
+            fontSize=24,
+            spaceAfter=30,
+            textColor=colors.navy,
+            alignment=1
+        ))
+        self.styles.add(ParagraphStyle(
+            name='SectionTitle',
+            parent=self.styles['Heading2'],
+            fontSize=16,
+            textColor=colors.navy,
+            spaceBefore=20,
+            spaceAfter=10
+        ))
+        self.cell_style = ParagraphStyle(name='SummaryCell', fontName='Helvetica', fontSize=10, leading=12, alignment=1)
+        self.table_style = TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.navy),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 12),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.white),
+            ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
+            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+            ('FONTSIZE', (0, 1), (-1, -1), 10),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.lightgrey]),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ])
+
+    def document(self, filename):
+        """Crée le document A4 avec les marges du rapport"""
+        return SimpleDocTemplate(
+            filename,
+            pagesize=A4,
+            rightMargin=1.5*cm,
+            leftMargin=1.5*cm,
+            topMargin=3*cm,
+            bottomMargin=2*cm
+        )
+
+    def draw_page(self, canvas, doc):
+        """Ajoute l'en-tête et le pied de page sur chaque page"""
+        width, height = A4
+        
+        # En-tête
+        canvas.saveState()
+        canvas.setFillColor(colors.navy)
+        canvas.rect(0, height - 2.5*cm, width, 2.5*cm, fill=True)
+        canvas.setFillColor(colors.white)
+        canvas.setFont("Helvetica-Bold", 16)
+        canvas.drawString(1*cm, height - 1.7*cm, self.title)
+        canvas.drawString(width - 5*cm, height - 1.7*cm, self.header_date)
+        
+        # Pied de page
+        canvas.setFillColor(colors.navy)
+        canvas.rect(0, 0, width, 1.5*cm, fill=True)
+        canvas.setFillColor(colors.white)
+        canvas.setFont("Helvetica", 8)
+        canvas.drawString(1*cm, 0.7*cm, f"Page {doc.page}")
+        canvas.drawString(width - 7*cm, 0.7*cm, "Rapport généré automatiquement")
+        canvas.restoreState()
+
+@lru_cache(maxsize=4)
+def get_report_template(generated_at):
+    """Gabarit partagé par les rapports d'une même génération (un par horodatage)"""
+    return ReportTemplate(generated_at)
+
+def render_pie_png(yes_count, no_count, title):
+    """Dessine le graphique circulaire Oui/Non et retourne le PNG"""
+    fig = Figure(figsize=(8, 6))
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    ax.pie([yes_count, no_count],
+           labels=['Oui', 'Non'],
+           colors=['#2ecc71', '#e74c3c'],
+           autopct='%1.1f%%',
+           startangle=90)
+    ax.set_title(title, pad=20, fontsize=12)
     
     img_data = BytesIO()
-    plt.savefig(img_data, format='png', dpi=150, bbox_inches='tight')
-    plt.close()
-    img_data.seek(0)
-    return Image(img_data, width=4*inch, height=3*inch)
+    fig.savefig(img_data, format='png', dpi=150, bbox_inches='tight')
+    return img_data.getvalue()
 
-def create_bar_chart(data, title):
-    """Crée un graphique en barres des coefficients moyens par groupe"""
-    plt.figure(figsize=(10, 5))
-    bars = plt.bar(data.keys(), data.values(), color='#3498db')
-    plt.title(title, pad=20, fontsize=12)
-    plt.xticks(rotation=45, ha='right')
-    plt.ylabel('Coefficient moyen')
+def render_bar_png(labels, values, title):
+    """Dessine le graphique en barres des coefficients moyens et retourne le PNG"""
+    fig = Figure(figsize=(10, 5))
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    bars = ax.bar(labels, values, color='#3498db')
+    ax.set_title(title, pad=20, fontsize=12)
+    ax.tick_params(axis='x', labelrotation=45)
+    for label in ax.get_xticklabels():
+        label.set_horizontalalignment('right')
+    ax.set_ylabel('Coefficient moyen')
     
     # Ajouter les valeurs sur les barres
     for bar in bars:
         height = bar.get_height()
-        plt.text(bar.get_x() + bar.get_width()/2., height,
+        ax.text(bar.get_x() + bar.get_width()/2., height,
                 f'{height:.1f}',
                 ha='center', va='bottom')
     
     img_data = BytesIO()
-    plt.savefig(img_data, format='png', dpi=150, bbox_inches='tight')
-    plt.close()
-    img_data.seek(0)
-    return Image(img_data, width=6*inch, height=3*inch)
-
-def create_summary_table(results):
-    """Crée un tableau récapitulatif des réponses"""
-    table_data = [['Groupe', 'Question', 'Réponse', 'Coefficient']]
-    for result in results:
-        table_data.append([
-            result['Groupe'],
-            result['Question'],
-            result['Réponse'],
-            str(result['Coefficient'])
-        ])
+    fig.savefig(img_data, format='png', dpi=150, bbox_inches='tight')
+    return img_data.getvalue()
+
+CHART_RENDERERS = {
+    'pie': render_pie_png,
+    'bar': render_bar_png,
+}
+
+def _render_chart(spec):
+    """Dessine un graphique décrit par (type, arguments) ; exécutable dans un autre processus"""
+    kind, args = spec
+    return CHART_RENDERERS[kind](*args)
+
+def chart_key(spec):
+    """Clé de cache : empreinte des données d'entrée du graphique"""
+    return hashlib.sha256(json.dumps(spec, sort_keys=True, default=str).encode()).hexdigest()
+
+def get_chart_pool(max_workers=None):
+    """Retourne le pool de processus de rendu des graphiques (créé une fois)
+
+    Les processus sont lancés en spawn : fork n'est pas sûr dans le serveur
+    Streamlit, dont d'autres threads peuvent détenir des verrous.
+    """
+    global _chart_pool
+    with _chart_pool_lock:
+        if _chart_pool is None:
+            _chart_pool = ProcessPoolExecutor(max_workers=max_workers or os.cpu_count(),
+                                              mp_context=get_context("spawn"))
+        return _chart_pool
+
+def render_charts(specs, parallel=True):
+    """Rend une liste de graphiques en PNG, en réutilisant le cache et en parallélisant les manquants"""
+    keys = [chart_key(spec) for spec in specs]
+    results = {}
+    with _chart_cache_lock:
+        for key in keys:
+            if key in _chart_cache:
+                _chart_cache.move_to_end(key)
+                results[key] = _chart_cache[key]
+    missing = {key: spec for key, spec in zip(keys, specs) if key not in results}
     
-    table_style = TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.navy),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 12),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.white),
-        ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
-        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 1), (-1, -1), 10),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.lightgrey]),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-    ])
+    if missing:
+        if parallel and len(missing) > 1:
+            rendered = get_chart_pool().map(_render_chart, missing.values())
+        else:
+            rendered = map(_render_chart, missing.values())
+        for key, png in zip(missing, rendered):
+            results[key] = png
+        with _chart_cache_lock:
+            for key in missing:
+                _chart_cache[key] = results[key]
+            while len(_chart_cache) > CHART_CACHE_SIZE:
+                _chart_cache.popitem(last=False)
+    return [results[key] for key in keys]
+
+def pie_chart_spec(responses, title):
+    """Description du graphique circulaire des réponses"""
+    yes_count = sum(1 for v in responses.values() if v == "Oui")
+    no_count = sum(1 for v in responses.values() if v == "Non")
+    return ('pie', (yes_count, no_count, title))
+
+def bar_chart_spec(data, title):
+    """Description du graphique en barres des coefficients moyens par groupe"""
+    return ('bar', (list(data.keys()), [float(v) for v in data.values()], title))
+
+def create_pie_chart(responses, title, png=None):
+    """Crée un graphique circulaire des réponses"""
+    png = png or render_charts([pie_chart_spec(responses, title)], parallel=False)[0]
+    return Image(BytesIO(png), width=4*inch, height=3*inch)
+
+def create_bar_chart(data, title, png=None):
+    """Crée un graphique en barres des coefficients moyens par groupe"""
+    png = png or render_charts([bar_chart_spec(data, title)], parallel=False)[0]
+    return Image(BytesIO(png), width=6*inch, height=3*inch)
+
+def create_vector_pie_chart(responses, title):
+    """Crée le graphique circulaire des réponses en graphisme vectoriel ReportLab"""
+    yes_count = sum(1 for v in responses.values() if v == "Oui")
+    no_count = sum(1 for v in responses.values() if v == "Non")
+    total = yes_count + no_count
     
-    table = Table(table_data, repeatRows=1)
-    table.setStyle(table_style)
-    return table
-
-def generate_beautiful_pdf(responses, results, filename="Rapport_Marketing.pdf"):
-    """Génère un rapport PDF décoratif et professionnel"""
-    doc = SimpleDocTemplate(
-        filename,
-        pagesize=A4,
-        rightMargin=1.5*cm,
-        leftMargin=1.5*cm,
-        topMargin=3*cm,
-        bottomMargin=2*cm
-    )
+    drawing = Drawing(4*inch, 3*inch)
+    drawing.add(String(2*inch, 2.8*inch, title, fontName='Helvetica', fontSize=10, textAnchor='middle'))
+    pie = Pie()
+    pie.x = 1.15*inch
+    pie.y = 0.25*inch
+    pie.width = pie.height = 2.2*inch
+    pie.startAngle = 90
+    pie.direction = 'anticlockwise'
+    if total:
+        pie.data = [yes_count, no_count]
+        pie.labels = [f"Oui {yes_count / total * 100:.1f}%", f"Non {no_count / total * 100:.1f}%"]
+        pie.slices[0].fillColor = colors.HexColor('#2ecc71')
+        pie.slices[1].fillColor = colors.HexColor('#e74c3c')
+    else:
+        pie.data = [1]
+        pie.labels = ["Aucune réponse"]
+        pie.slices[0].fillColor = colors.lightgrey
+    pie.slices.strokeColor = colors.white
+    pie.slices.fontSize = 9
+    drawing.add(pie)
+    return drawing
+
+def create_vector_bar_chart(data, title):
+    """Crée le graphique en barres des coefficients moyens en graphisme vectoriel ReportLab"""
+    drawing = Drawing(6*inch, 3*inch)
+    drawing.add(String(3*inch, 2.8*inch, title, fontName='Helvetica', fontSize=10, textAnchor='middle'))
+    chart = VerticalBarChart()
+    chart.x = 0.6*inch
+    chart.y = 1*inch
+    chart.width = 5.2*inch
+    chart.height = 1.6*inch
+    chart.data = [[float(v) for v in data.values()] or [0]]
+    chart.categoryAxis.categoryNames = [str(k) for k in data.keys()] or [""]
+    chart.categoryAxis.labels.angle = 45
+    chart.categoryAxis.labels.boxAnchor = 'ne'
+    chart.categoryAxis.labels.fontSize = 7
+    chart.valueAxis.valueMin = 0
+    chart.valueAxis.labels.fontSize = 8
+    chart.bars[0].fillColor = colors.HexColor('#3498db')
+    chart.bars[0].strokeColor = None
+    chart.barLabelFormat = '%.1f'
+    chart.barLabels.nudge = 6
+    chart.barLabels.fontSize = 7
+    drawing.add(chart)
+    drawing.add(String(0.15*inch, 1.8*inch, 'Coefficient moyen', fontName='Helvetica', fontSize=8,
+                       textAnchor='middle', angle=90))
+    return drawing
+
+class FlowableStream(list):
+    """Liste de flowables remplie à la demande depuis un itérateur
+
+    SimpleDocTemplate.build consomme sa liste par le début : seuls les
+    flowables en cours de mise en page (plus une courte avance pour
+    keepWithNext) sont construits et gardés en mémoire.
+    """
+    LOOKAHEAD = 4
+
+    def __init__(self, flowables):
+        super().__init__()
+        self._source = iter(flowables)
+
+    def _fill(self, size):
+        while list.__len__(self) < size:
+            try:
+                self.append(next(self._source))
+            except StopIteration:
+                return
+
+    def __len__(self):
+        self._fill(self.LOOKAHEAD)
+        return list.__len__(self)
+
+    def __getitem__(self, index):
+        if isinstance(index, int) and index >= 0:
+            self._fill(index + 1)
+        return list.__getitem__(self, index)
+
+class SummaryCell(Paragraph):
+    """Cellule à retour à la ligne qui ne recalcule pas sa coupure pour une même largeur
+
+    Table mesure chaque cellule plusieurs fois (hauteur, découpage, dessin).
+    """
+
+    def wrap(self, availWidth, availHeight):
+        if getattr(self, '_wrapped', None) != availWidth:
+            self._size = super().wrap(availWidth, availHeight)
+            self._wrapped = availWidth
+        return self._size
+
+def _summary_cell(text, width, style):
+    """Texte simple s'il tient dans la colonne, sinon cellule Paragraph à retour à la ligne"""
+    text = str(text)
+    if pdfmetrics.stringWidth(text, style.fontName, style.fontSize) <= width - 12:
+        return text
+    return SummaryCell(escape(text), style)
+
+def create_summary_table(results, chunk_rows=SUMMARY_CHUNK_ROWS, template=None):
+    """Crée le tableau récapitulatif des réponses, découpé en sous-tableaux
+
+    results peut être une liste ou un itérateur : les lignes sont lues par
+    paquets de chunk_rows et chaque paquet donne un Table avec son en-tête.
+    Les textes longs passent à la ligne dans des cellules Paragraph.
+    """
+    template = template or ReportTemplate()
+    cell_style = template.cell_style
+    header = ['Groupe', 'Question', 'Réponse', 'Coefficient']
     
-    # Styles
-    styles = getSampleStyleSheet()
-    styles.add(ParagraphStyle(
-        name='CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=24,
-        spaceAfter=30,
-        textColor=colors.navy,
-        alignment=1
-    ))
-    styles.add(ParagraphStyle(
-        name='SectionTitle',
-        parent=styles['Heading2'],
-        fontSize=16,
-        textColor=colors.navy,
-        spaceBefore=20,
-        spaceAfter=10
-    ))
+    rows = iter(results)
+    while True:
+        chunk = list(islice(rows, chunk_rows))
+        if not chunk:
+            return
+        table_data = [header]
+        for result in chunk:
+            table_data.append([
+                _summary_cell(result['Groupe'], SUMMARY_COL_WIDTHS[0], cell_style),
+                _summary_cell(result['Question'], SUMMARY_COL_WIDTHS[1], cell_style),
+                result['Réponse'],
+                str(result['Coefficient'])
+            ])
+        table = Table(table_data, colWidths=SUMMARY_COL_WIDTHS, repeatRows=1)
+        table.setStyle(template.table_style)
+        yield table
+
+def generate_beautiful_pdf(responses, results, filename="Rapport_Marketing.pdf", parallel_charts=True,
+                           chart_format="vector", template=None):
+    """Génère un rapport PDF décoratif et professionnel
+
+    results est parcouru deux fois (moyennes des graphiques, puis tableau lu
+    par paquets) : il doit être ré-itérable, par exemple une liste ou un objet
+    dont __iter__ relit la source ; un itérateur à usage unique est refusé.
+    chart_format : "vector" (graphiques ReportLab, par défaut) ou "png"
+    (graphiques matplotlib rastérisés). template : gabarit partagé entre
+    plusieurs rapports (un nouveau gabarit est créé s'il est absent).
+    """
+    if iter(results) is results:
+        raise TypeError("results doit être ré-itérable (liste ou séquence), pas un itérateur à usage unique")
+    template = template or ReportTemplate()
+    styles = template.styles
+    doc = template.document(filename)
     
     # Contenu
     story = []
@@ -146,35 +391,168 @@ def generate_beautiful_pdf(responses, results, filename="Rapport_Marketing.pdf")
     
     # Introduction
     story.append(Paragraph("Analyse des Réponses", styles['SectionTitle']))
-    story.append(Paragraph(
-        f"Date de génération : {datetime.now().strftime('%d/%m/%Y à %H:%M')}",
-        styles['Normal']
-    ))
+    story.append(Paragraph(template.generation_text, styles['Normal']))
     story.append(Spacer(1, 20))
     
+    # Coefficients moyens par groupe (sommes courantes : mémoire proportionnelle au nombre de groupes)
+    group_coeffs = {}
+    for result in results:
+        totals = group_coeffs.setdefault(result['Groupe'], [0, 0])
+        totals[0] += result['Coefficient']
+        totals[1] += 1
+    avg_coeffs = {group: total / count for group, (total, count) in group_coeffs.items()}
+    
+    pie_title = "Répartition des Réponses Oui/Non"
+    bar_title = "Coefficients Moyens par Groupe"
+    if chart_format == "vector":
+        pie_chart = create_vector_pie_chart(responses, pie_title)
+        bar_chart = create_vector_bar_chart(avg_coeffs, bar_title)
+    else:
+        # Les deux graphiques sont rendus ensemble (cache puis pool de processus)
+        pie_png, bar_png = render_charts(
+            [pie_chart_spec(responses, pie_title), bar_chart_spec(avg_coeffs, bar_title)],
+            parallel=parallel_charts
+        )
+        pie_chart = create_pie_chart(responses, pie_title, png=pie_png)
+        bar_chart = create_bar_chart(avg_coeffs, bar_title, png=bar_png)
+    
     # Graphique circulaire des réponses
     story.append(Paragraph("Distribution des Réponses", styles['SectionTitle']))
-    story.append(create_pie_chart(responses, "Répartition des Réponses Oui/Non"))
+    story.append(pie_chart)
     story.append(Spacer(1, 20))
     
     # Graphique des coefficients moyens par groupe
     story.append(Paragraph("Analyse par Groupe", styles['SectionTitle']))
-    group_coeffs = {}
-    for result in results:
-        group = result['Groupe']
-        if group not in group_coeffs:
-            group_coeffs[group] = []
-        group_coeffs[group].append(result['Coefficient'])
-    
-    avg_coeffs = {group: np.mean(coeffs) for group, coeffs in group_coeffs.items()}
-    story.append(create_bar_chart(avg_coeffs, "Coefficients Moyens par Groupe"))
+    story.append(bar_chart)
     story.append(PageBreak())
     
     # Tableau détaillé des réponses
     story.append(Paragraph("Détail des Réponses", styles['SectionTitle']))
     story.append(Spacer(1, 10))
-    story.append(create_summary_table(results))
     
-    # Génération du PDF
-    doc.build(story, onFirstPage=create_header_footer, onLaterPages=create_header_footer)
-    return filename 
\ No newline at end of file
+    # Génération du PDF (sous-tableaux construits au fil de la mise en page)
+    doc.build(FlowableStream(chain(story, create_summary_table(results, template=template))),
+              onFirstPage=template.draw_page, onLaterPages=template.draw_page)
+    return filename 
+
+def generate_report(job, generated_at=None):
+    """Génère un rapport (tuple responses, results, filename) avec les graphiques rendus sur place
+
+    Utilisable dans un processus de pool : generated_at fixe la même date pour tout un lot.
+    """
+    responses, results, filename = job
+    template = get_report_template(generated_at or datetime.now())
+    return generate_beautiful_pdf(responses, results, filename, parallel_charts=False, template=template)
+
+def generate_reports(jobs, max_workers=None):
+    """Génère plusieurs rapports en parallèle, un par processus
+
+    jobs : liste de tuples (responses, results, filename). Chaque processus
+    garde son propre cache de graphiques et son gabarit, réutilisés d'un
+    rapport à l'autre ; tous les rapports portent la même date de génération.
+    """
+    jobs = list(jobs)
+    generate = partial(generate_report, generated_at=datetime.now())
+    max_workers = max_workers or os.cpu_count()
+    if len(jobs) <= 1 or max_workers == 1:
+        return [generate(job) for job in jobs]
+    chunksize = max(1, len(jobs) // (4 * max_workers))
+    # spawn, comme le pool des graphiques : pas de fork d'un serveur aux threads actifs
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=get_context("spawn")) as pool:
+        return list(pool.map(generate, jobs, chunksize=chunksize))
+
+def _synthetic_job(i, directory):
+    """Rapport synthétique pour les mesures"""
+    groups = [f"Groupe {g}" for g in range(6)]
+    results = [
+        {'Groupe': groups[q % 6], 'Question': f"Question {q}", 'Réponse': "Oui" if (q + i) % 3 else "Non",
+         'Coefficient': 1 if (q + i) % 3 else 0}
+        for q in range(45)
+    ]
+    responses = {r['Question']: r['Réponse'] for r in results}
+    return responses, results, os.path.join(directory, f"rapport_{i}.pdf")
+
+def benchmark(reports=200, workers=(1, None)):
+    """Mesure le temps de génération d'un lot de rapports selon le nombre de processus"""
+    import tempfile
+    import time
+
+    timings = []
+    with tempfile.TemporaryDirectory() as directory:
+        jobs = [_synthetic_job(i, directory) for i in range(reports)]
+        for max_workers in workers:
+            _chart_cache.clear()
+            start = time.perf_counter()
+            generate_reports(jobs, max_workers=max_workers)
+            timings.append((max_workers or os.cpu_count(), time.perf_counter() - start))
+    return timings
+
+def chart_benchmark(reports=20):
+    """Compare taille et temps de génération : graphiques vectoriels contre PNG rastérisés"""
+    import tempfile
+    import time
+
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        # Données différentes à chaque rapport : le cache PNG ne fausse pas la mesure
+        jobs = [_synthetic_job(i, directory) for i in range(reports)]
+        for chart_format in ("png", "vector"):
+            start = time.perf_counter()
+            sizes = []
+            for responses, report_results, filename in jobs:
+                generate_beautiful_pdf(responses, report_results, filename, parallel_charts=False,
+                                       chart_format=chart_format)
+                sizes.append(os.path.getsize(filename))
+            results[chart_format] = {
+                'seconds_per_report': (time.perf_counter() - start) / reports,
+                'bytes_per_report': sum(sizes) / reports,
+            }
+    results['size_ratio'] = results['png']['bytes_per_report'] / results['vector']['bytes_per_report']
+    results['speedup'] = results['png']['seconds_per_report'] / results['vector']['seconds_per_report']
+    return results
+
+def template_benchmark(reports=200):
+    """Mesure le surcoût par rapport : gabarit recréé à chaque rapport contre gabarit partagé"""
+    import tempfile
+    import time
+
+    results = {}
+    # Coût de la préparation seule (feuilles de style, TableStyle, horodatage)
+    start = time.perf_counter()
+    for _ in range(reports):
+        ReportTemplate()
+    results['template_ms'] = (time.perf_counter() - start) / reports * 1000
+
+    with tempfile.TemporaryDirectory() as directory:
+        responses, report_results, filename = _synthetic_job(0, directory)
+        shared = ReportTemplate()
+        for name, template in (('recréé', None), ('partagé', shared)):
+            start = time.perf_counter()
+            for _ in range(reports):
+                generate_beautiful_pdf(responses, report_results, filename, parallel_charts=False, template=template)
+            results[name] = (time.perf_counter() - start) / reports * 1000
+    return results
+
+if __name__ == "__main__":
+    # python pdf_generator.py [rapports]            : lot de rapports, 1 processus contre tous
+    # python pdf_generator.py graphiques [rapports] : graphiques vectoriels contre PNG
+    # python pdf_generator.py gabarit [rapports]    : surcoût du gabarit par rapport
+    import sys
+    args = sys.argv[1:]
+    if args and args[0] == "gabarit":
+        reports = int(args[1]) if len(args) > 1 else 200
+        results = template_benchmark(reports)
+        print(f"Préparation du gabarit : {results['template_ms']:.2f} ms")
+        print(f"Rapport avec gabarit recréé  : {results['recréé']:.2f} ms")
+        print(f"Rapport avec gabarit partagé : {results['partagé']:.2f} ms")
+    elif args and args[0] == "graphiques":
+        reports = int(args[1]) if len(args) > 1 else 20
+        results = chart_benchmark(reports)
+        for chart_format in ("png", "vector"):
+            print(f"{chart_format:>6} : {results[chart_format]['seconds_per_report'] * 1000:7.1f} ms, "
+                  f"{results[chart_format]['bytes_per_report'] / 1024:7.1f} Ko par rapport")
+        print(f"Taille divisée par {results['size_ratio']:.1f}, génération {results['speedup']:.1f}x plus rapide")
+    else:
+        reports = int(args[0]) if args else 200
+        for workers, seconds in benchmark(reports):
+            print(f"{workers:>3} processus : {seconds:.2f} s pour {reports} rapports")
@@ -0,0 +1,230 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, ALL_COMPLETED, FIRST_COMPLETED, wait
+from datetime import datetime
+from multiprocessing import get_context
+
+import storage
+from pdf_generator import generate_report
+from writer import atomic_write_json
+
+# Rapports PDF par client : database/reports/<client>.pdf + manifeste de reprise
+REPORTS_DIR = "database/reports"
+MANIFEST_FILE = os.path.join(REPORTS_DIR, "manifest.json")
+ZIP_FILE = os.path.join(REPORTS_DIR, "rapports_clients.zip")
+
+
+def read_manifest():
+    """Lit le manifeste des rapports déjà générés (client -> empreinte, fichier, date)"""
+    try:
+        with open(MANIFEST_FILE, "r", encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {'clients': {}}
+
+
+def report_filename(client_name):
+    """Nom de fichier sûr et unique pour le rapport d'un client"""
+    slug = re.sub(r'[^A-Za-z0-9_-]+', '_', client_name).strip('_')[:60] or "client"
+    digest = hashlib.sha1(client_name.encode('utf-8')).hexdigest()[:8]
+    return f"Rapport_{slug}_{digest}.pdf"
+
+
+def fingerprint(records):
+    """Empreinte des réponses d'un client : change dès qu'une réponse est ajoutée ou modifiée"""
+    digest = hashlib.sha256()
+    for record in sorted(records, key=lambda r: (r.get('date') or '', r.get('group') or '', r.get('question') or '')):
+        digest.update(json.dumps(record, sort_keys=True, ensure_ascii=False).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def client_report_data(records):
+    """Construit les entrées de generate_beautiful_pdf à partir des réponses d'un client
+
+    Pour chaque question, seule la réponse la plus récente est retenue.
+    """
+    latest = {}
+    for record in sorted(records, key=lambda r: r.get('date') or ''):
+        latest[(record.get('group'), record.get('question'))] = record
+
+    responses = {}
+    results = []
+    for record in latest.values():
+        responses[record['question']] = record['response']
+        results.append({
+            'Groupe': record.get('group_title') or record.get('group'),
+            'Question': record['question'],
+            'Réponse': record['response'],
+            'Coefficient': 1 if record['response'] == "Oui" else 0,
+        })
+    return responses, results
+
+
+def iter_clients():
+    """Parcourt les réponses client par client, sans remplir le cache partagé
+
+    En JSON, les réponses sont déjà en mémoire : elles sont regroupées en une
+    seule passe. En SQLite, une requête filtrée par client.
+    """
+    backend = storage.get_storage()
+    if isinstance(backend, storage.JsonStorage):
+        by_client = {}
+        for record in storage.load_responses():
+            by_client.setdefault(record.get('client_name', ''), []).append(record)
+        for client_name in sorted(by_client):
+            yield client_name, by_client[client_name]
+        return
+    for client_name in storage.response_facets()['clients']:
+        yield client_name, backend.load_responses(client_name=client_name)
+
+
+def generate_client_reports(max_workers=None, force=False, progress=None):
+    """Génère en parallèle les rapports PDF de tous les clients
+
+    Les clients dont les réponses n'ont pas changé depuis leur dernier rapport
+    sont ignorés. Le manifeste est mis à jour après chaque rapport terminé :
+    une génération interrompue reprend là où elle s'était arrêtée.
+    progress(fait, total, client) est appelé après chaque client traité.
+    """
+    os.makedirs(REPORTS_DIR, exist_ok=True)
+    manifest = read_manifest()
+    entries = manifest['clients']
+    clients = storage.response_facets()['clients']
+    summary = {'total': len(clients), 'generated': 0, 'skipped': 0, 'failed': []}
+    max_workers = max_workers or os.cpu_count()
+    # Même gabarit et même date de génération pour tous les rapports du lot
+    generated_at = datetime.now()
+    done = 0
+
+    def finish(client_name):
+        nonlocal done
+        done += 1
+        if progress:
+            progress(done, len(clients), client_name)
+
+    # spawn : le serveur Streamlit a des threads actifs, fork n'est pas sûr
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=get_context("spawn")) as pool:
+        pending = {}
+
+        def collect(block):
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED if block else ALL_COMPLETED)
+            for future in finished:
+                client_name, entry = pending.pop(future)
+                try:
+                    future.result()
+                except Exception as e:
+                    summary['failed'].append({'client': client_name, 'error': str(e)})
+                else:
+                    entries[client_name] = entry
+                    atomic_write_json(MANIFEST_FILE, manifest)
+                    summary['generated'] += 1
+                finish(client_name)
+
+        for client_name, records in iter_clients():
+            entry = {
+                'fingerprint': fingerprint(records),
+                'file': report_filename(client_name),
+                'records': len(records),
+                'generated_at': generated_at.isoformat(),
+            }
+            previous = entries.get(client_name)
+            if (not force and previous and previous['fingerprint'] == entry['fingerprint']
+                    and os.path.exists(os.path.join(REPORTS_DIR, previous['file']))):
+                summary['skipped'] += 1
+                finish(client_name)
+                continue
+
+            responses, results = client_report_data(records)
+            job = (responses, results, os.path.join(REPORTS_DIR, entry['file']))
+            pending[pool.submit(generate_report, job, generated_at)] = (client_name, entry)
+            # Nombre de rapports en attente borné : les réponses ne sont pas toutes chargées d'un coup
+            if len(pending) >= 2 * max_workers:
+                collect(block=True)
+
+        if pending:
+            collect(block=False)
+
+    return summary
+
+
+def build_zip(zip_path=ZIP_FILE):
+    """Regroupe les rapports du manifeste et le manifeste lui-même dans une archive ZIP"""
+    manifest = read_manifest()
+    temp_path = f"{zip_path}.tmp"
+    with zipfile.ZipFile(temp_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
+        for entry in manifest['clients'].values():
+            path = os.path.join(REPORTS_DIR, entry['file'])
+            if os.path.exists(path):
+                zipf.write(path, entry['file'])
+        zipf.writestr("manifest.json", json.dumps(manifest, indent=4, ensure_ascii=False))
+    os.replace(temp_path, zip_path)
+    return zip_path
+
+
+
+# Génération lancée depuis l'administration : un seul lot à la fois, en arrière-plan
+_job = {'running': False}
+_job_lock = threading.Lock()
+
+
+def report_job_status():
+    """État de la génération en arrière-plan (copie : running, done, total, client, summary, zip, error)"""
+    with _job_lock:
+        return dict(_job)
+
+
+def start_report_job(max_workers=None, force=False):
+    """Lance la génération des rapports et de l'archive ZIP dans un thread d'arrière-plan
+
+    Le serveur Streamlit n'attend pas les processus de génération ; l'avancement
+    se lit avec report_job_status(). Retourne False si un lot est déjà en cours.
+    """
+    with _job_lock:
+        if _job['running']:
+            return False
+        _job.clear()
+        _job.update({'running': True, 'done': 0, 'total': 0, 'client': None,
+                     'summary': None, 'zip': None, 'error': None})
+
+    def progress(done, total, client_name):
+        with _job_lock:
+            _job.update({'done': done, 'total': total, 'client': client_name})
+
+    def run():
+        try:
+            summary = generate_client_reports(max_workers=max_workers, force=force, progress=progress)
+            zip_path = build_zip()
+        except Exception as e:
+            with _job_lock:
+                _job.update({'running': False, 'error': str(e)})
+        else:
+            with _job_lock:
+                _job.update({'running': False, 'summary': summary, 'zip': zip_path})
+
+    threading.Thread(target=run, name="client-reports", daemon=True).start()
+    return True
+
+if __name__ == "__main__":
+    # python reports.py [--workers N] [--force] [--zip]
+    parser = argparse.ArgumentParser(description="Génère les rapports PDF de tous les clients")
+    parser.add_argument("--workers", type=int, default=None, help="nombre de processus")
+    parser.add_argument("--force", action="store_true", help="régénérer même les rapports à jour")
+    parser.add_argument("--zip", action="store_true", help="créer l'archive ZIP des rapports")
+    args = parser.parse_args()
+
+    def show(done, total, client_name):
+        print(f"[{done}/{total}] {client_name}", flush=True)
+
+    summary = generate_client_reports(max_workers=args.workers, force=args.force, progress=show)
+    print(f"{summary['generated']} générés, {summary['skipped']} à jour, {len(summary['failed'])} en échec")
+    for failure in summary['failed']:
+        print(f"  {failure['client']} : {failure['error']}", file=sys.stderr)
+    if args.zip:
+        print(f"Archive : {build_zip()}")
+    sys.exit(1 if summary['failed'] else 0)
@@ -0,0 +1,107 @@
+import json
+import sys
+import tracemalloc
+from array import array
+
+import numpy as np
+import pandas as pd
+
+import snapshots
+import storage
+
+# Colonnes dont les valeurs se répètent d'une ligne à l'autre (encodées par dictionnaire)
+CATEGORY_COLUMNS = ['username', 'client_name', 'group', 'group_title', 'question']
+FRAME_COLUMNS = ['date'] + CATEGORY_COLUMNS + ['response', 'is_yes', 'comment']
+
+
+def build_response_frame(records):
+    """Construit un DataFrame compact (catégories, int8, datetime64) à partir des réponses
+
+    Les textes répétés (questions, groupes, clients, utilisateurs) ne sont
+    stockés qu'une fois par valeur ; chaque ligne ne garde que leurs codes.
+    """
+    codes = {col: array('i') for col in CATEGORY_COLUMNS}
+    lookups = {col: {} for col in CATEGORY_COLUMNS}
+    dates = []
+    is_yes = array('b')
+    comments = []
+
+    for record in records:
+        for col in CATEGORY_COLUMNS:
+            value = record.get(col) or ''
+            lookup = lookups[col]
+            code = lookup.get(value)
+            if code is None:
+                code = lookup[value] = len(lookup)
+            codes[col].append(code)
+        dates.append(record.get('date'))
+        is_yes.append(record.get('response') == 'Oui')
+        comments.append(record.get('comment') or '')
+
+    yes = np.frombuffer(is_yes, dtype=np.int8) if is_yes else np.zeros(0, dtype=np.int8)
+    data = {'date': pd.to_datetime(pd.Series(dates, dtype=object), format='ISO8601')}
+    for col in CATEGORY_COLUMNS:
+        col_codes = np.frombuffer(codes[col], dtype=np.int32) if codes[col] else np.zeros(0, dtype=np.int32)
+        data[col] = pd.Categorical.from_codes(col_codes, categories=list(lookups[col]))
+    data['response'] = pd.Categorical.from_codes(yes, categories=['Non', 'Oui'])
+    data['is_yes'] = yes
+    data['comment'] = comments
+    return pd.DataFrame(data, columns=FRAME_COLUMNS)
+
+
+def load_response_frame(**filters):
+    """Charge les réponses filtrées sous forme compacte
+
+    Les instantanés Parquet sont lus en priorité (filtres appliqués aux
+    partitions et row groups) ; sinon le stockage principal est utilisé.
+    """
+    snapshots.start_compactor()
+    df = snapshots.load_snapshot_frame(**filters)
+    if df is not None:
+        return df.sort_values('date', kind='stable', ignore_index=True)[FRAME_COLUMNS]
+    return build_response_frame(storage.load_responses(**filters))
+
+
+def _synthetic_records(rows):
+    """Génère des réponses synthétiques au format du stockage"""
+    rng = np.random.default_rng(0)
+    questions = [f"Question {i} : utilisez-vous les réseaux sociaux pour votre marketing ?" for i in range(45)]
+    return [
+        {
+            "date": f"2025-04-{1 + i % 28:02d}T10:{i % 60:02d}:00.000000",
+            "username": f"user{i % 20}",
+            "client_name": f"client{int(rng.integers(500))}",
+            "group": f"groupe{i % 6}",
+            "group_title": f"Stratégie Marketing {i % 6}",
+            "question": questions[i % len(questions)],
+            "response": "Oui" if rng.random() < 0.6 else "Non",
+            "comment": ""
+        }
+        for i in range(rows)
+    ]
+
+
+def memory_benchmark(rows=100000):
+    """Compare la mémoire du DataFrame brut (objets) et du modèle compact"""
+    # Aller-retour JSON : chaque chaîne est un objet distinct, comme après lecture du stockage
+    records = json.loads(json.dumps(_synthetic_records(rows)))
+    results = {}
+    for name, builder in (('objets', pd.DataFrame), ('compact', build_response_frame)):
+        tracemalloc.start()
+        df = builder(records)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        results[name] = {'deep_bytes': int(df.memory_usage(deep=True).sum()), 'peak_bytes': peak}
+        del df
+    results['ratio'] = round(results['objets']['deep_bytes'] / results['compact']['deep_bytes'], 1)
+    return results
+
+
+if __name__ == "__main__":
+    # python response_frame.py [lignes]
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    results = memory_benchmark(rows)
+    for name in ('objets', 'compact'):
+        print(f"{name:>8} : {results[name]['deep_bytes'] / 2**20:8.1f} Mo "
+              f"(pic de construction {results[name]['peak_bytes'] / 2**20:.1f} Mo)")
+    print(f"Réduction : {results['ratio']}x")
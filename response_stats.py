@@ -0,0 +1,116 @@
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from aggregates import group_stats, question_stats, group_trends
+
+KEY_COLUMNS = ['username', 'client_name', 'group', 'question']
+
+
+def add_is_yes(df):
+    """Calcule une seule fois la colonne is_yes (int8 : 1 pour Oui, 0 sinon)"""
+    df['is_yes'] = (df['response'] == 'Oui').astype('int8')
+    return df
+
+
+def counts_from_frame(df):
+    """Agrège des réponses brutes en compteurs Oui/Non en une seule passe vectorisée
+
+    Le résultat a la même forme que aggregates.counts_frame, ce qui permet de
+    réutiliser les mêmes tableaux statistiques sur les réponses brutes.
+    """
+    if 'is_yes' not in df.columns:
+        add_is_yes(df)
+    day = pd.to_datetime(df['date']).dt.normalize().rename('day')
+    counts = df.groupby([day] + [df[c] for c in KEY_COLUMNS], observed=True, sort=False)['is_yes'].agg(['sum', 'count'])
+    counts = counts.rename(columns={'sum': 'oui', 'count': 'total'}).reset_index()
+    counts['oui'] = counts['oui'].astype('int64')
+    counts['non'] = counts['total'] - counts['oui']
+    return counts
+
+
+def progress_stats(trends):
+    """Progression par groupe (valeurs initiale, finale et variation moyenne)"""
+    trends = trends.sort_values('date')
+    grouped = trends.groupby('group')[['response', 'coefficient']]
+    diffs = grouped.diff().groupby(trends['group']).mean()
+    progress = pd.concat([
+        grouped.first()['response'], grouped.last()['response'], diffs['response'],
+        grouped.first()['coefficient'], grouped.last()['coefficient'], diffs['coefficient'],
+    ], axis=1).round(2)
+    progress.columns = [
+        'Taux Initial (%)', 'Taux Final (%)', 'Progression Moyenne (%)',
+        'Score Initial', 'Score Final', 'Progression Score'
+    ]
+    return progress
+
+
+def synthetic_history(rows, seed=0):
+    """Génère un historique de réponses synthétique pour les mesures"""
+    rng = np.random.default_rng(seed)
+    groups = [f"groupe{i}" for i in range(6)]
+    questions = [f"Question {i} : avez-vous une stratégie marketing documentée ?" for i in range(45)]
+    dates = pd.date_range("2025-01-01", periods=90, freq="D")
+    return pd.DataFrame({
+        'date': dates[rng.integers(0, len(dates), rows)],
+        'username': pd.Series(rng.integers(0, 20, rows)).map(lambda i: f"user{i}"),
+        'client_name': pd.Series(rng.integers(0, 500, rows)).map(lambda i: f"client{i}"),
+        'group': np.array(groups)[rng.integers(0, len(groups), rows)],
+        'question': np.array(questions)[rng.integers(0, len(questions), rows)],
+        'response': np.where(rng.random(rows) < 0.6, 'Oui', 'Non'),
+    })
+
+
+def _legacy_stats(df):
+    """Ancienne méthode du dashboard (agrégations avec lambdas Python)"""
+    agg = {
+        'response': [
+            ('Total', 'count'),
+            ('Oui', lambda x: (x == 'Oui').sum()),
+            ('Non', lambda x: (x == 'Non').sum()),
+            ('% Oui', lambda x: (x == 'Oui').mean() * 100)
+        ]
+    }
+    df.groupby('group').agg(agg)
+    df.groupby(['group', 'question']).agg(agg)
+    df.groupby([pd.Grouper(key='date', freq='D'), 'group']).agg({
+        'response': lambda x: (x == 'Oui').mean() * 100
+    })
+
+
+def _vectorized_stats(df):
+    """Nouvelle méthode : is_yes calculé une fois puis agrégations natives"""
+    counts = counts_from_frame(df)
+    group_stats(counts)
+    question_stats(counts)
+    group_trends(counts)
+
+
+def benchmark(sizes=(10**5, 10**6), repeat=3):
+    """Compare les agrégations avec lambdas et la version vectorisée"""
+    results = []
+    for rows in sizes:
+        df = synthetic_history(rows)
+        timings = {}
+        for name, func in (('lambdas', _legacy_stats), ('vectorisé', _vectorized_stats)):
+            best = float('inf')
+            for _ in range(repeat):
+                start = time.perf_counter()
+                func(df.drop(columns='is_yes', errors='ignore'))
+                best = min(best, time.perf_counter() - start)
+            timings[name] = best
+        results.append({
+            'lignes': rows,
+            'lambdas (s)': round(timings['lambdas'], 3),
+            'vectorisé (s)': round(timings['vectorisé'], 3),
+            'accélération': round(timings['lambdas'] / timings['vectorisé'], 1),
+        })
+    return pd.DataFrame(results)
+
+
+if __name__ == "__main__":
+    # python response_stats.py [lignes ...]   ex. : python response_stats.py 100000 1000000 10000000
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10**5, 10**6]
+    print(benchmark(sizes).to_string(index=False))
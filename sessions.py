@@ -0,0 +1,280 @@
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+# Durée de vie d'une session (s), nombre maximal de sessions gardées en mémoire
+SESSION_TTL = int(os.environ.get("TAZRIGT_SESSION_TTL", str(12 * 3600)))
+SESSION_MAX = int(os.environ.get("TAZRIGT_SESSION_MAX", "10000"))
+# Persistance des sessions : "memory" (processus) ou "sqlite" (survit aux redémarrages)
+SESSION_BACKEND = os.environ.get("TAZRIGT_SESSION_STORE", "memory")
+SESSION_DB = "database/sessions.db"
+# Clé de signature des jetons (TAZRIGT_SESSION_SECRET, sinon générée une fois)
+SECRET_FILE = "database/users/session_secret"
+# Avec SQLite, une session en mémoire est revérifiée dans la base au plus toutes les N secondes
+REVALIDATE_INTERVAL = 30
+# Cookie portant le jeton (nouvel onglet, rechargement, reconnexion) ; jamais dans l'URL
+COOKIE_NAME = "tazrigt_session"
+# Intervalle minimal (s) entre deux purges des sessions expirées
+PURGE_INTERVAL = 600
+
+_secret = None
+_secret_lock = threading.Lock()
+
+
+def _load_secret():
+    """Clé HMAC des jetons, créée avec des droits restreints à la première utilisation"""
+    global _secret
+    with _secret_lock:
+        if _secret is None:
+            if os.environ.get("TAZRIGT_SESSION_SECRET"):
+                _secret = os.environ["TAZRIGT_SESSION_SECRET"].encode('utf-8')
+                return _secret
+            os.makedirs(os.path.dirname(SECRET_FILE), exist_ok=True)
+            try:
+                fd = os.open(SECRET_FILE, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+            except FileExistsError:
+                # Clé créée par une version antérieure ou copiée à la main : lisible du seul propriétaire
+                os.chmod(SECRET_FILE, 0o600)
+                with open(SECRET_FILE, "r", encoding='ascii') as f:
+                    _secret = f.read().strip().encode('ascii')
+            else:
+                value = secrets.token_hex(32)
+                with os.fdopen(fd, "w", encoding='ascii') as f:
+                    f.write(value)
+                _secret = value.encode('ascii')
+        return _secret
+
+
+def sign(session_id):
+    """Signature HMAC-SHA256 (tronquée) d'un identifiant de session"""
+    digest = hmac.new(_load_secret(), session_id.encode('ascii'), hashlib.sha256).digest()[:18]
+    return base64.urlsafe_b64encode(digest).decode('ascii')
+
+
+def parse_token(token):
+    """Identifiant de session d'un jeton "<id>.<signature>", None si la signature est invalide"""
+    if not isinstance(token, str):
+        return None
+    session_id, _, signature = token.partition(".")
+    if not session_id or not signature or not session_id.isascii():
+        return None
+    return session_id if hmac.compare_digest(signature, sign(session_id)) else None
+
+
+class SessionStore:
+    """Sessions côté serveur : LRU en mémoire avec expiration, éventuellement adossé à SQLite
+
+    Valider un jeton coûte une vérification HMAC et une recherche dans un
+    dictionnaire. Les sessions d'un utilisateur sont indexées par nom pour
+    pouvoir toutes les invalider (suppression du compte, nouveau mot de passe).
+    """
+
+    def __init__(self, ttl=SESSION_TTL, max_entries=SESSION_MAX, db_path=None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.db_path = db_path
+        # session_id -> [utilisateur, expiration, dernière vérification en base]
+        self._entries = OrderedDict()
+        self._by_user = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._last_purge = 0.0
+
+    def connect(self):
+        """Connexion SQLite du thread courant (schéma créé à la première connexion)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS sessions (
+                    session_id TEXT PRIMARY KEY,
+                    username TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_username ON sessions (username)")
+            self._local.conn = conn
+        return conn
+
+    def _remember(self, session_id, username, expires_at, now):
+        """Ajoute une session en mémoire (sous verrou), en évinçant la moins récemment utilisée"""
+        self._entries[session_id] = [username, expires_at, now]
+        self._entries.move_to_end(session_id)
+        self._by_user.setdefault(username, set()).add(session_id)
+        while len(self._entries) > self.max_entries:
+            self._forget(next(iter(self._entries)))
+            self.evictions += 1
+
+    def _forget(self, session_id):
+        """Retire une session de la mémoire (sous verrou)"""
+        entry = self._entries.pop(session_id, None)
+        if entry is not None:
+            user_sessions = self._by_user.get(entry[0])
+            if user_sessions is not None:
+                user_sessions.discard(session_id)
+                if not user_sessions:
+                    del self._by_user[entry[0]]
+
+    def create(self, username):
+        """Ouvre une session et retourne son jeton signé"""
+        session_id = secrets.token_urlsafe(18)
+        now = time.time()
+        expires_at = now + self.ttl
+        if self.db_path:
+            self.connect().execute(
+                "INSERT INTO sessions (session_id, username, expires_at) VALUES (?, ?, ?)",
+                (session_id, username, expires_at)
+            )
+        with self._lock:
+            self._remember(session_id, username, expires_at, now)
+            purge = now - self._last_purge >= PURGE_INTERVAL
+            if purge:
+                self._last_purge = now
+        # Purge périodique à l'ouverture des sessions : la base ne grossit pas indéfiniment
+        if purge:
+            self.purge_expired()
+        return f"{session_id}.{sign(session_id)}"
+
+    def validate(self, token):
+        """Retourne l'utilisateur d'un jeton valide et non expiré, sinon None"""
+        session_id = parse_token(token)
+        if session_id is None:
+            return None
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is not None and entry[1] <= now:
+                self._forget(session_id)
+                entry = None
+            if entry is not None and (not self.db_path or now - entry[2] < REVALIDATE_INTERVAL):
+                self._entries.move_to_end(session_id)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+        if not self.db_path:
+            return None
+
+        # Session inconnue de ce processus ou à revérifier (invalidée par un autre processus ?)
+        row = self.connect().execute(
+            "SELECT username, expires_at FROM sessions WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        with self._lock:
+            if row is None or row[1] <= now:
+                self._forget(session_id)
+                return None
+            self._remember(session_id, row[0], row[1], now)
+        return row[0]
+
+    def revoke(self, token):
+        """Ferme une session (déconnexion)"""
+        session_id, _, _ = (token or "").partition(".")
+        with self._lock:
+            self._forget(session_id)
+        if self.db_path:
+            self.connect().execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def invalidate_user(self, username, keep_token=None):
+        """Ferme toutes les sessions d'un utilisateur (sauf éventuellement celle de keep_token)
+
+        Retourne le nombre de sessions fermées.
+        """
+        keep = (keep_token or "").partition(".")[0]
+        with self._lock:
+            session_ids = [sid for sid in self._by_user.get(username, ()) if sid != keep]
+            for session_id in session_ids:
+                self._forget(session_id)
+        closed = len(session_ids)
+        if self.db_path:
+            cursor = self.connect().execute(
+                "DELETE FROM sessions WHERE username = ? AND session_id != ?", (username, keep)
+            )
+            closed = max(closed, cursor.rowcount)
+        return closed
+
+    def purge_expired(self):
+        """Supprime les sessions expirées (mémoire et base)"""
+        now = time.time()
+        with self._lock:
+            expired = [sid for sid, entry in self._entries.items() if entry[1] <= now]
+            for session_id in expired:
+                self._forget(session_id)
+        if self.db_path:
+            self.connect().execute("DELETE FROM sessions WHERE expires_at <= ?", (now,))
+        return len(expired)
+
+    def stats(self):
+        """Compteurs du magasin de sessions"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'sessions': len(self._entries),
+                'users': len(self._by_user),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'evictions': self.evictions,
+            }
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_session_store():
+    """Retourne le magasin de sessions du processus (TAZRIGT_SESSION_STORE)"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = SessionStore(db_path=SESSION_DB if SESSION_BACKEND == "sqlite" else None)
+        return _store
+
+
+def invalidate_user(username, keep_token=None):
+    """Ferme toutes les sessions d'un utilisateur"""
+    return get_session_store().invalidate_user(username, keep_token=keep_token)
+
+
+def benchmark(sessions=10000, validations=200000, persistent=False):
+    """Mesure la validation des jetons avec un grand nombre de sessions ouvertes"""
+    import tempfile
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        try:
+            store = SessionStore(max_entries=sessions, db_path=SESSION_DB if persistent else None)
+            tokens = [store.create(f"membre{n % 2000}") for n in range(sessions)]
+            start = time.perf_counter()
+            valid = sum(store.validate(tokens[n % sessions]) is not None for n in range(validations))
+            elapsed = time.perf_counter() - start
+            start = time.perf_counter()
+            closed = store.invalidate_user("membre0")
+            invalidation = time.perf_counter() - start
+        finally:
+            os.chdir(cwd)
+    return {
+        'validations_per_second': validations / elapsed,
+        'valid': valid,
+        'invalidated': closed,
+        'invalidation_ms': invalidation * 1000,
+        **store.stats(),
+    }
+
+
+if __name__ == "__main__":
+    # python sessions.py [sessions validations] [--sqlite]
+    params = [int(arg) for arg in sys.argv[1:] if arg.isdigit()]
+    print(json.dumps(benchmark(*params, persistent="--sqlite" in sys.argv), indent=4))
@@ -0,0 +1,331 @@
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow est optionnel : sans lui on lit le stockage principal
+    pa = None
+
+import storage
+from writer import file_lock
+
+# Instantanés Parquet partitionnés par mois : database/snapshots/month=AAAA-MM/*.parquet
+SNAPSHOT_DIR = "database/snapshots"
+# Le manifeste liste les fichiers de la génération courante : les lecteurs n'en lisent pas d'autres
+MANIFEST_FILE = os.path.join(SNAPSHOT_DIR, "_manifest.json")
+ROW_GROUP_SIZE = 50000
+COMPACT_INTERVAL = 600
+# Le mois en cours est compacté dès qu'il dépasse ce nombre de fichiers
+COMPACT_PARTS = 32
+# Délai (s) avant de supprimer les fichiers remplacés (lectures en cours sur l'ancienne génération)
+OBSOLETE_GRACE = 300
+
+STRING_COLUMNS = ['username', 'client_name', 'group', 'group_title', 'question', 'response']
+
+_lock = threading.Lock()
+_rebuilding = threading.Event()
+_compact_requested = threading.Event()
+_compactor = None
+
+
+def available():
+    """Indique si les instantanés Parquet sont utilisables (pyarrow installé)"""
+    return pa is not None
+
+
+def _schema():
+    """Schéma Arrow : textes répétés encodés par dictionnaire"""
+    fields = [pa.field('date', pa.timestamp('us'))]
+    fields += [pa.field(col, pa.dictionary(pa.int32(), pa.string())) for col in STRING_COLUMNS]
+    fields += [pa.field('is_yes', pa.int8()), pa.field('comment', pa.string())]
+    return pa.schema(fields)
+
+
+def _to_table(records):
+    """Convertit des réponses du stockage en table Arrow"""
+    columns = {
+        'date': [datetime.fromisoformat(r['date']) for r in records],
+        'is_yes': [1 if r.get('response') == 'Oui' else 0 for r in records],
+        'comment': [r.get('comment') or '' for r in records],
+    }
+    for col in STRING_COLUMNS:
+        columns[col] = [r.get(col) or '' for r in records]
+    return pa.table(columns, schema=_schema())
+
+
+def _sort_table(table):
+    """Trie par client puis par date pour des statistiques de row groups sélectives"""
+    keys = pa.table({'client_name': table['client_name'].cast(pa.string()), 'date': table['date']})
+    return table.take(pc.sort_indices(keys, sort_keys=[('client_name', 'ascending'), ('date', 'ascending')]))
+
+
+def _read_manifest():
+    """Lit le manifeste : réponses couvertes, version du stockage, fichiers de la génération courante"""
+    try:
+        with open(MANIFEST_FILE, "r", encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        manifest = None
+    if not manifest or 'files' not in manifest:
+        # Absent ou antérieur à la liste des fichiers : à reconstruire
+        return {'records': -1, 'version': None, 'files': [], 'obsolete': []}
+    manifest.setdefault('obsolete', [])
+    return manifest
+
+
+def _write_manifest(manifest, root=SNAPSHOT_DIR):
+    """Écrit le manifeste de façon atomique"""
+    path = os.path.join(root, "_manifest.json")
+    temp_path = os.path.join(root, "_manifest.json.tmp")
+    with open(temp_path, "w", encoding='utf-8') as f:
+        json.dump(manifest, f)
+    os.replace(temp_path, path)
+
+
+def _write_part(table, month_dir):
+    """Écrit un fichier Parquet dans une partition (fichier temporaire masqué puis renommage)
+
+    Retourne le chemin relatif à la racine des instantanés ("month=AAAA-MM/part-….parquet").
+    """
+    name = f"part-{uuid.uuid4().hex}.parquet"
+    temp_path = os.path.join(month_dir, f".{name}.tmp")
+    pq.write_table(table, temp_path, row_group_size=ROW_GROUP_SIZE)
+    os.replace(temp_path, os.path.join(month_dir, name))
+    return f"{os.path.basename(month_dir)}/{name}"
+
+
+def _write_partitions(records, root):
+    """Écrit une nouvelle part par mois concerné et retourne leurs chemins relatifs"""
+    by_month = {}
+    for record in records:
+        by_month.setdefault(record['date'][:7], []).append(record)
+    written = []
+    for month, month_records in by_month.items():
+        month_dir = os.path.join(root, f"month={month}")
+        os.makedirs(month_dir, exist_ok=True)
+        written.append(_write_part(_sort_table(_to_table(month_records)), month_dir))
+    return written
+
+
+def _month_parts(manifest):
+    """Nombre de fichiers de la génération courante par partition ("month=AAAA-MM")"""
+    parts = {}
+    for path in manifest['files']:
+        month = path.split("/", 1)[0]
+        parts[month] = parts.get(month, 0) + 1
+    return parts
+
+
+def append_snapshot(records):
+    """Ajoute des réponses validées aux instantanés (appelé après chaque enregistrement)"""
+    if not available() or not records:
+        return
+    with _lock, file_lock(MANIFEST_FILE):
+        manifest = _read_manifest()
+        if manifest['records'] < 0:
+            return
+        try:
+            manifest['files'] += _write_partitions(records, SNAPSHOT_DIR)
+            manifest['records'] += len(records)
+            manifest['version'] = storage.response_version()
+            _write_manifest(manifest)
+        except Exception:
+            # L'instantané sera reconstruit, le stockage principal reste la référence
+            if os.path.exists(MANIFEST_FILE):
+                os.remove(MANIFEST_FILE)
+            return
+    # Trop de petits fichiers dans un mois (le mois en cours en reçoit un par questionnaire)
+    if max(_month_parts(manifest).values(), default=0) >= COMPACT_PARTS:
+        _compact_requested.set()
+
+
+def rebuild_snapshots():
+    """Reconstruit tous les instantanés depuis le stockage principal"""
+    # Version lue avant les réponses : une écriture pendant la reconstruction la rend périmée
+    version = storage.response_version()
+    responses = storage.load_responses()
+    temp_root = f"{SNAPSHOT_DIR}.rebuild"
+    shutil.rmtree(temp_root, ignore_errors=True)
+    os.makedirs(temp_root)
+    files = _write_partitions(responses, temp_root)
+    _write_manifest({'records': len(responses), 'version': version, 'files': files, 'obsolete': []}, temp_root)
+    with _lock:
+        old_root = f"{SNAPSHOT_DIR}.old"
+        shutil.rmtree(old_root, ignore_errors=True)
+        if os.path.exists(SNAPSHOT_DIR):
+            os.replace(SNAPSHOT_DIR, old_root)
+        os.replace(temp_root, SNAPSHOT_DIR)
+        shutil.rmtree(old_root, ignore_errors=True)
+
+
+def _rebuild_in_background():
+    """Lance une reconstruction en arrière-plan si aucune n'est en cours"""
+    if _rebuilding.is_set():
+        return
+    _rebuilding.set()
+
+    def run():
+        try:
+            rebuild_snapshots()
+        finally:
+            _rebuilding.clear()
+
+    threading.Thread(target=run, name="snapshot-rebuild", daemon=True).start()
+
+
+def is_fresh(manifest=None):
+    """Vérifie que les instantanés correspondent au stockage (nombre de réponses et version)
+
+    La version (taille et date du journal, ou dernier identifiant SQLite)
+    détecte aussi une restauration ou une modification à nombre égal.
+    """
+    manifest = manifest or _read_manifest()
+    return (manifest['records'] == storage.response_facets()['count']
+            and manifest['version'] == storage.response_version())
+
+
+def _filter_expression(client_name=None, username=None, group=None, start_date=None, end_date=None):
+    """Traduit les filtres du dashboard en prédicat Arrow (partitions + statistiques)"""
+    expression = None
+    conditions = []
+    if client_name is not None:
+        conditions.append(ds.field('client_name') == client_name)
+    if username is not None:
+        conditions.append(ds.field('username') == username)
+    if group is not None:
+        conditions.append(ds.field('group') == group)
+    if start_date is not None:
+        conditions.append(ds.field('month') >= start_date.strftime("%Y-%m"))
+        conditions.append(ds.field('date') >= pa.scalar(datetime.combine(start_date, datetime.min.time()), pa.timestamp('us')))
+    if end_date is not None:
+        end = datetime.combine(end_date + timedelta(days=1), datetime.min.time())
+        conditions.append(ds.field('month') <= end_date.strftime("%Y-%m"))
+        conditions.append(ds.field('date') < pa.scalar(end, pa.timestamp('us')))
+    for condition in conditions:
+        expression = condition if expression is None else expression & condition
+    return expression
+
+
+def load_snapshot_frame(columns=None, **filters):
+    """Lit les instantanés en ne chargeant que les partitions, row groups et colonnes utiles
+
+    Retourne None si les instantanés sont indisponibles ou en retard sur le
+    stockage (une reconstruction est alors lancée en arrière-plan).
+    """
+    if not available():
+        return None
+    manifest = _read_manifest()
+    if not is_fresh(manifest):
+        _rebuild_in_background()
+        return None
+    if not manifest['files']:
+        return None
+
+    try:
+        # Uniquement les fichiers de la génération du manifeste : jamais de mélange avec une compaction
+        dataset = ds.dataset(
+            [os.path.join(SNAPSHOT_DIR, path) for path in manifest['files']],
+            format="parquet", partitioning="hive", partition_base_dir=SNAPSHOT_DIR
+        )
+        table = dataset.to_table(columns=columns, filter=_filter_expression(**filters))
+    except (FileNotFoundError, OSError):
+        # Compaction ou reconstruction en cours : le stockage principal prend le relais
+        return None
+    if 'month' in table.column_names:
+        table = table.drop(['month'])
+    df = table.to_pandas()
+    if 'response' in df.columns:
+        df['response'] = df['response'].cat.set_categories(['Non', 'Oui'])
+    return df
+
+
+def compact_month(month):
+    """Fusionne les fichiers d'un mois ("month=AAAA-MM") en un seul, trié par client et date
+
+    Le verrou du mois empêche deux compactions simultanées (processus compris).
+    Le fichier fusionné remplace les anciens dans le manifeste en une seule
+    écriture atomique ; les anciens ne sont supprimés qu'après OBSOLETE_GRACE.
+    """
+    month_dir = os.path.join(SNAPSHOT_DIR, month)
+    with file_lock(month_dir):
+        parts = [path for path in _read_manifest()['files'] if path.split("/", 1)[0] == month]
+        if len(parts) < 2:
+            return False
+        try:
+            tables = [pq.read_table(os.path.join(SNAPSHOT_DIR, p), schema=_schema()) for p in parts]
+        except (FileNotFoundError, OSError):
+            # Reconstruction en cours : les fichiers ont été remplacés
+            return False
+        table = _sort_table(pa.concat_tables(tables).unify_dictionaries())
+        merged = _write_part(table, month_dir)
+
+        with _lock, file_lock(MANIFEST_FILE):
+            manifest = _read_manifest()
+            if not set(parts) <= set(manifest['files']):
+                os.remove(os.path.join(SNAPSHOT_DIR, merged))
+                return False
+            manifest['files'] = [p for p in manifest['files'] if p not in parts] + [merged]
+            manifest['obsolete'] += [[p, time.time()] for p in parts]
+            _write_manifest(manifest)
+    return True
+
+
+def purge_obsolete(grace=OBSOLETE_GRACE):
+    """Supprime les fichiers remplacés depuis plus de grace secondes"""
+    with _lock, file_lock(MANIFEST_FILE):
+        manifest = _read_manifest()
+        now = time.time()
+        expired = [entry for entry in manifest['obsolete'] if now - entry[1] >= grace]
+        if not expired:
+            return 0
+        for path, _ in expired:
+            try:
+                os.remove(os.path.join(SNAPSHOT_DIR, path))
+            except FileNotFoundError:
+                pass
+        manifest['obsolete'] = [entry for entry in manifest['obsolete'] if now - entry[1] < grace]
+        _write_manifest(manifest)
+    return len(expired)
+
+
+def compact_partitions():
+    """Compacte les mois terminés, et le mois en cours s'il a dépassé COMPACT_PARTS fichiers"""
+    if not available() or not os.path.isdir(SNAPSHOT_DIR):
+        return 0
+    current_month = f"month={datetime.now().strftime('%Y-%m')}"
+    compacted = 0
+    for month, parts in sorted(_month_parts(_read_manifest()).items()):
+        if parts >= 2 and (month < current_month or parts >= COMPACT_PARTS):
+            compacted += compact_month(month)
+    purge_obsolete()
+    return compacted
+
+
+def start_compactor(interval=COMPACT_INTERVAL):
+    """Démarre (une seule fois par processus) la compaction en arrière-plan
+
+    Elle s'exécute toutes les interval secondes, ou dès qu'un mois dépasse COMPACT_PARTS fichiers.
+    """
+    global _compactor
+    if not available() or (_compactor is not None and _compactor.is_alive()):
+        return
+
+    def run():
+        while True:
+            _compact_requested.wait(interval)
+            _compact_requested.clear()
+            try:
+                compact_partitions()
+            except Exception:
+                pass
+
+    _compactor = threading.Thread(target=run, name="snapshot-compactor", daemon=True)
+    _compactor.start()
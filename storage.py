@@ -0,0 +1,947 @@
+import copy
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import timedelta
+
+from writer import atomic_write_json, file_lock, get_write_queue
+
+# Emplacements des fichiers de données
+RESPONSES_DIR = "database/responses"
+LEGACY_HISTORY_FILE = os.path.join(RESPONSES_DIR, "responses_history.json")
+HISTORY_LOG_FILE = os.path.join(RESPONSES_DIR, "responses_history.jsonl")
+QUESTIONS_FILE = os.path.join(RESPONSES_DIR, "questions.json")
+COUNTS_FILE = os.path.join(RESPONSES_DIR, "response_counts.json")
+# Compteurs ajoutés depuis la dernière consolidation de COUNTS_FILE (une ligne par écriture)
+COUNTS_DELTA_FILE = os.path.join(RESPONSES_DIR, "response_counts.delta.jsonl")
+# Consolidation dès que les ajouts dépassent la base (et au moins cette taille en octets)
+COUNTS_COMPACT_BYTES = 1024 * 1024
+# Octets de fin du journal inclus dans sa signature (réécriture de même taille détectée)
+COUNTS_TAIL_BYTES = 4096
+USERS_FILE = "database/users/users.json"
+SQLITE_FILE = "database/tazrigt.db"
+
+# Backend de stockage : "json" (fichiers) ou "sqlite"
+STORAGE_BACKEND = os.environ.get("TAZRIGT_STORAGE", "json")
+
+COUNT_KEY_COLUMNS = ["day", "username", "client_name", "group", "question"]
+RESPONSE_COLUMNS = ["date", "username", "client_name", "group", "group_title", "question", "response", "comment"]
+
+
+# Ligne de validation écrite après les réponses d'un questionnaire dans le journal
+COMMIT_MARKER = "_commit"
+
+
+def _log_lines(records):
+    """Sérialise les réponses en NDJSON, suivies d'une ligne de validation par questionnaire"""
+    lines = []
+    for index, record in enumerate(records):
+        lines.append(json.dumps(record, ensure_ascii=False) + "\n")
+        submission_id = record.get('submission_id')
+        next_id = records[index + 1].get('submission_id') if index + 1 < len(records) else None
+        if submission_id and submission_id != next_id:
+            lines.append(json.dumps({COMMIT_MARKER: submission_id}) + "\n")
+    return "".join(lines)
+
+
+def _write_lines(f, records):
+    """Écrit les enregistrements au format NDJSON en une seule écriture"""
+    f.write(_log_lines(records))
+    f.flush()
+    os.fsync(f.fileno())
+
+
+def stage_record(pending, record, previous_id):
+    """Met en attente une réponse de questionnaire jusqu'à sa ligne de validation
+
+    pending : {submission_id: (réponses, questions vues)}. Un questionnaire est
+    écrit d'un seul bloc, sans question répétée : un bloc non contigu ou une
+    question déjà vue signale une nouvelle écriture, qui remplace les lignes
+    orphelines d'une écriture interrompue.
+    """
+    submission_id = record['submission_id']
+    key = (record.get('group'), record.get('question'))
+    block = pending.get(submission_id)
+    if block is None or submission_id != previous_id or key in block[1]:
+        block = pending[submission_id] = ([], set())
+    block[0].append(record)
+    block[1].add(key)
+
+
+def _is_committed_end(line):
+    """Indique si une ligne complète du journal peut terminer le fichier
+
+    C'est le cas d'une ligne de validation ou d'une réponse antérieure aux
+    identifiants de soumission ; une réponse d'un questionnaire non validé ne l'est pas.
+    """
+    try:
+        record = json.loads(line)
+    except json.JSONDecodeError:
+        return False
+    return COMMIT_MARKER in record or not record.get('submission_id')
+
+
+def _repair_tail(log_file):
+    """Supprime la fin laissée par une écriture interrompue
+
+    Le journal est tronqué juste après la dernière ligne de validation : les
+    réponses d'un questionnaire écrit en partie (même sur des lignes complètes)
+    sont retirées, sinon elles seraient rendues avec celles du questionnaire
+    renvoyé plus tard sous le même identifiant.
+    """
+    with open(log_file, "rb+") as f:
+        size = f.seek(0, os.SEEK_END)
+        position = size
+        tail = b""
+        while True:
+            # Lignes complètes connues de la fin du fichier (la première peut être coupée)
+            first = 0 if position == 0 else tail.find(b"\n") + 1
+            if position == 0 or first > 0:
+                offset = position + first
+                ends = []
+                for line in tail[first:].split(b"\n")[:-1]:
+                    offset += len(line) + 1
+                    ends.append((line, offset))
+                for line, end in reversed(ends):
+                    if line.strip() and _is_committed_end(line):
+                        if end != size:
+                            f.truncate(end)
+                        return
+            if position == 0:
+                f.truncate(0)
+                return
+            # Remonter dans le fichier par blocs de taille croissante
+            step = min(max(4096, len(tail)), position)
+            position -= step
+            f.seek(position)
+            tail = f.read(step) + tail
+
+
+def convert_legacy_history(legacy_file, log_file=HISTORY_LOG_FILE):
+    """Convertit un ancien historique JSON en journal NDJSON dans un fichier temporaire unique
+
+    Le fichier est créé à côté de log_file ; l'appelant l'installe (ou le supprime).
+    Retourne son chemin.
+    """
+    with open(legacy_file, "r", encoding='utf-8') as f:
+        history = json.load(f)
+    directory = os.path.dirname(log_file) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_file = tempfile.mkstemp(prefix=f".{os.path.basename(log_file)}.", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding='utf-8') as f:
+            _write_lines(f, history)
+    except BaseException:
+        os.remove(temp_file)
+        raise
+    return temp_file
+
+
+def migrate_legacy_history(legacy_file=LEGACY_HISTORY_FILE, log_file=HISTORY_LOG_FILE):
+    """Convertit l'ancien historique JSON en journal NDJSON (migration unique, sans écraser un journal)"""
+    if not os.path.exists(legacy_file) or os.path.exists(log_file):
+        return False
+
+    with file_lock(legacy_file):
+        # Une autre session a pu faire la migration pendant l'attente du verrou
+        if not os.path.exists(legacy_file):
+            return False
+
+        temp_file = convert_legacy_history(legacy_file, log_file)
+        try:
+            # Lien plutôt que remplacement : échoue si un journal a été créé entre-temps
+            os.link(temp_file, log_file)
+        except FileExistsError:
+            return False
+        finally:
+            os.remove(temp_file)
+
+        # Conserver l'ancien fichier pour référence, sans qu'il soit relu
+        os.replace(legacy_file, f"{legacy_file}.migrated")
+    return True
+
+
+def read_responses(file_path=HISTORY_LOG_FILE):
+    """Lit l'historique des réponses (journal NDJSON ou ancien fichier JSON)"""
+    if file_path == HISTORY_LOG_FILE:
+        migrate_legacy_history()
+
+    try:
+        with open(file_path, "r", encoding='utf-8') as f:
+            if file_path.endswith(".json"):
+                return json.load(f)
+
+            responses = []
+            # Réponses d'un questionnaire en attente de leur ligne de validation
+            pending = {}
+            previous_id = None
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # Dernière ligne tronquée par un arrêt brutal : on l'ignore
+                    if not line.endswith("\n"):
+                        break
+                    raise
+                submission_id = record.get('submission_id')
+                if COMMIT_MARKER in record:
+                    responses.extend(pending.pop(record[COMMIT_MARKER], ([],))[0])
+                elif submission_id:
+                    stage_record(pending, record, previous_id)
+                else:
+                    # Réponses enregistrées avant les identifiants de soumission
+                    responses.append(record)
+                previous_id = submission_id
+            # Un questionnaire sans ligne de validation n'a pas été écrit entièrement
+            return responses
+    except FileNotFoundError:
+        return []
+
+
+def append_responses(records, log_file=HISTORY_LOG_FILE):
+    """Ajoute des réponses à la fin du journal en une seule écriture
+
+    Retourne la taille du journal avant l'ajout (après réparation d'une fin interrompue).
+    """
+    if not records:
+        return os.path.getsize(log_file) if os.path.exists(log_file) else 0
+    if log_file == HISTORY_LOG_FILE:
+        migrate_legacy_history()
+
+    os.makedirs(os.path.dirname(log_file), exist_ok=True)
+    if os.path.exists(log_file):
+        _repair_tail(log_file)
+    with open(log_file, "a", encoding='utf-8') as f:
+        start = f.tell()
+        _write_lines(f, records)
+    return start
+
+
+def _read_json(file_path, default):
+    """Lit un fichier JSON, ou retourne la valeur par défaut s'il n'existe pas"""
+    try:
+        with open(file_path, "r", encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return default
+
+
+def _write_json(file_path, data):
+    """Écrit un fichier JSON via un fichier temporaire et un remplacement atomique"""
+    atomic_write_json(file_path, data)
+
+
+def _count_key(record):
+    """Clé d'agrégation (jour, utilisateur, client, groupe, question) d'une réponse"""
+    return (
+        (record.get('date') or '')[:10],
+        record.get('username'),
+        record.get('client_name'),
+        record.get('group'),
+        record.get('question'),
+    )
+
+
+def _add_counts(counts, records):
+    """Ajoute les réponses aux compteurs Oui/Non agrégés"""
+    for record in records:
+        entry = counts.setdefault(_count_key(record), [0, 0])
+        if record.get('response') == 'Oui':
+            entry[0] += 1
+        else:
+            entry[1] += 1
+    return counts
+
+
+def _filter_counts(rows, client_name=None, username=None, group=None, start_date=None, end_date=None):
+    """Filtre les lignes agrégées [jour, utilisateur, client, groupe, question, oui, non]"""
+    start = start_date.isoformat() if start_date else None
+    end = end_date.isoformat() if end_date else None
+    return [
+        row for row in rows
+        if (client_name is None or row[2] == client_name)
+        and (username is None or row[1] == username)
+        and (group is None or row[3] == group)
+        and (start is None or row[0] >= start)
+        and (end is None or row[0] <= end)
+    ]
+
+
+class DataCache:
+    """Cache partagé par tout le processus, invalidé par mtime/taille ou par compteur d'écritures"""
+
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._generations = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def signature(paths):
+        """Empreinte (mtime, taille) des fichiers sources"""
+        stamps = []
+        for path in paths:
+            try:
+                stat = os.stat(path)
+                stamps.append((stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                stamps.append(None)
+        return tuple(stamps)
+
+    def get(self, paths, key, loader):
+        """Retourne la valeur en cache si les fichiers n'ont pas changé, sinon la recharge"""
+        paths = tuple(paths)
+        cache_key = (paths, key)
+        with self._lock:
+            stamp = (self.signature(paths), self._generations.get(paths[0], 0))
+            entry = self._entries.get(cache_key)
+            if entry is not None and entry[0] == stamp:
+                self.hits += 1
+                self._entries.move_to_end(cache_key)
+                return entry[1]
+            self.misses += 1
+
+        # Chargement hors du verrou pour ne pas bloquer les autres sessions
+        value = loader()
+        with self._lock:
+            self._entries[cache_key] = (stamp, value)
+            self._entries.move_to_end(cache_key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def invalidate(self, path):
+        """Incrémente le compteur d'écritures d'un fichier après une sauvegarde"""
+        with self._lock:
+            self._generations[path] = self._generations.get(path, 0) + 1
+
+    def stats(self):
+        """Retourne les compteurs du cache"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'entries': len(self._entries),
+            }
+
+
+_cache = DataCache()
+
+
+def _date_bounds(start_date=None, end_date=None):
+    """Convertit un intervalle de dates (inclusif) en bornes ISO comparables"""
+    start = start_date.isoformat() if start_date else None
+    end = (end_date + timedelta(days=1)).isoformat() if end_date else None
+    return start, end
+
+
+class JsonStorage:
+    """Stockage dans les fichiers JSON (journal NDJSON pour les réponses)"""
+
+    name = "json"
+
+    FILES = {
+        'responses': [HISTORY_LOG_FILE],
+        'counts': [COUNTS_FILE, HISTORY_LOG_FILE, COUNTS_DELTA_FILE],
+        'questions': [QUESTIONS_FILE],
+        'users': [USERS_FILE],
+    }
+
+    def files(self, kind):
+        """Fichiers dont dépend un type de données (pour l'invalidation du cache)"""
+        return self.FILES[kind]
+
+    def load_responses(self, client_name=None, username=None, group=None, start_date=None, end_date=None):
+        """Charge les réponses correspondant aux filtres"""
+        responses = _cache.get(self.files('responses'), 'all', read_responses)
+        start, end = _date_bounds(start_date, end_date)
+        return [
+            r for r in responses
+            if (client_name is None or r.get('client_name') == client_name)
+            and (username is None or r.get('username') == username)
+            and (group is None or r.get('group') == group)
+            and (start is None or r.get('date', '') >= start)
+            and (end is None or r.get('date', '') < end)
+        ]
+
+    def response_facets(self, username=None):
+        """Retourne les valeurs distinctes utiles aux filtres du dashboard"""
+        responses = self.load_responses(username=username)
+        dates = [r['date'] for r in responses if r.get('date')]
+        return {
+            'count': len(responses),
+            'clients': sorted({r.get('client_name', '') for r in responses}),
+            'users': sorted({r.get('username', '') for r in responses}),
+            'groups': sorted({r.get('group', '') for r in responses}),
+            'min_date': min(dates) if dates else None,
+            'max_date': max(dates) if dates else None,
+        }
+
+    def response_version(self):
+        """Version des réponses : (taille, mtime) du journal, change à chaque écriture ou restauration"""
+        try:
+            stat = os.stat(HISTORY_LOG_FILE)
+        except FileNotFoundError:
+            return [0, 0]
+        return [stat.st_size, stat.st_mtime_ns]
+
+    def submission_ids(self):
+        """Identifiants des questionnaires déjà enregistrés"""
+        responses = _cache.get(self.files('responses'), 'all', read_responses)
+        return {r['submission_id'] for r in responses if r.get('submission_id')}
+
+    @staticmethod
+    def _log_signature():
+        """Signature du journal : taille, date de modification (ns) et empreinte de sa fin
+
+        Une restauration ou une réécriture de même taille (Oui et Non échangés)
+        change la signature : les compteurs qui s'y rattachent sont recalculés.
+        """
+        try:
+            with open(HISTORY_LOG_FILE, "rb") as f:
+                stat = os.fstat(f.fileno())
+                f.seek(max(0, stat.st_size - COUNTS_TAIL_BYTES))
+                tail = hashlib.sha256(f.read()).hexdigest()[:16]
+        except FileNotFoundError:
+            return [0, 0, None]
+        return [stat.st_size, stat.st_mtime_ns, tail]
+
+    def _read_counts(self):
+        """Compteurs de la base consolidée plus les ajouts, ou None s'ils ne suivent plus le journal
+
+        Chaque ajout indique la signature du journal avant et après son écriture :
+        la chaîne doit partir de la base et arriver à la signature actuelle du journal.
+        """
+        data = _read_json(COUNTS_FILE, None)
+        if data is None:
+            return None
+        counts = {tuple(row[:5]): row[5:] for row in data['rows']}
+        log_signature = data.get('log')
+        try:
+            with open(COUNTS_DELTA_FILE, "r", encoding='utf-8') as f:
+                for line in f:
+                    delta = json.loads(line)
+                    if delta['from'] != log_signature:
+                        return None
+                    for row in delta['rows']:
+                        entry = counts.setdefault(tuple(row[:5]), [0, 0])
+                        entry[0] += row[5]
+                        entry[1] += row[6]
+                    log_signature = delta['to']
+        except FileNotFoundError:
+            pass
+        except (json.JSONDecodeError, KeyError):
+            return None
+        if log_signature != self._log_signature():
+            return None
+        return counts
+
+    def _current_counts(self):
+        """Compteurs agrégés, recalculés depuis le journal s'ils ne le suivent plus"""
+        counts = self._read_counts()
+        if counts is None:
+            counts = _add_counts({}, read_responses())
+            # Base réécrite par le thread écrivain (sous le verrou du journal) pour les lectures suivantes
+            get_write_queue().submit(HISTORY_LOG_FILE, None, self._consolidate_counts, mode="replace")
+        return counts
+
+    def load_counts(self, **filters):
+        """Charge les compteurs Oui/Non agrégés correspondant aux filtres"""
+        rows = [list(k) + v for k, v in self._current_counts().items()]
+        return _filter_counts(rows, **filters)
+
+    def save_responses(self, records):
+        """Ajoute des réponses via le thread écrivain (ajouts simultanés regroupés)"""
+        get_write_queue().write(HISTORY_LOG_FILE, list(records), self._append_batch)
+
+    def _consolidate_counts(self, _=None):
+        """Réécrit la base des compteurs et vide le fichier des ajouts (sous verrou)"""
+        counts = self._read_counts()
+        if counts is None:
+            counts = _add_counts({}, read_responses())
+        _write_json(COUNTS_FILE, {
+            'log': self._log_signature(),
+            'rows': [list(k) + v for k, v in counts.items()]
+        })
+        if os.path.exists(COUNTS_DELTA_FILE):
+            os.remove(COUNTS_DELTA_FILE)
+
+    def _append_batch(self, records):
+        """Ajoute des réponses au journal et leurs compteurs au fichier des ajouts (sous verrou)
+
+        Le coût dépend du lot, pas de l'historique : les compteurs existants ne
+        sont pas relus. La base n'est consolidée que lorsque les ajouts dépassent
+        sa taille, soit un coût amorti constant par réponse.
+        """
+        if not os.path.exists(COUNTS_FILE):
+            self._consolidate_counts()
+        log_before = self._log_signature()
+        append_responses(records)
+        delta = {
+            'from': log_before,
+            'to': self._log_signature(),
+            'rows': [list(k) + v for k, v in _add_counts({}, records).items()],
+        }
+        with open(COUNTS_DELTA_FILE, "a", encoding='utf-8') as f:
+            f.write(json.dumps(delta, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+        if os.path.getsize(COUNTS_DELTA_FILE) > max(COUNTS_COMPACT_BYTES, os.path.getsize(COUNTS_FILE)):
+            self._consolidate_counts()
+
+    def load_questions(self):
+        """Charge les groupes de questions"""
+        return _read_json(QUESTIONS_FILE, [])
+
+    def save_questions(self, questions):
+        """Sauvegarde les groupes de questions"""
+        get_write_queue().write(QUESTIONS_FILE, questions, self._write_questions, mode="replace")
+
+    def _write_questions(self, questions):
+        """Écrit le fichier des questions (sous verrou)"""
+        _write_json(QUESTIONS_FILE, questions)
+
+    def load_users(self):
+        """Charge les utilisateurs"""
+        return _read_json(USERS_FILE, {})
+
+    def save_users(self, users):
+        """Sauvegarde les utilisateurs"""
+        get_write_queue().write(USERS_FILE, users, self._write_users, mode="replace")
+
+    def _write_users(self, users):
+        """Écrit le fichier des utilisateurs (sous verrou)"""
+        _write_json(USERS_FILE, users)
+
+    def export_to_files(self):
+        """Les fichiers JSON sont déjà la source de vérité"""
+
+    def import_from_files(self):
+        """Les fichiers JSON sont déjà la source de vérité"""
+
+
+class SQLiteStorage:
+    """Stockage dans une base SQLite embarquée (mode WAL, requêtes indexées)"""
+
+    name = "sqlite"
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS responses (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            date TEXT NOT NULL,
+            username TEXT,
+            client_name TEXT,
+            "group" TEXT,
+            group_title TEXT,
+            question TEXT,
+            response TEXT,
+            comment TEXT,
+            extra TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_responses_client ON responses (client_name);
+        CREATE INDEX IF NOT EXISTS idx_responses_username ON responses (username);
+        CREATE INDEX IF NOT EXISTS idx_responses_group ON responses ("group");
+        CREATE INDEX IF NOT EXISTS idx_responses_date ON responses (date);
+
+        CREATE TABLE IF NOT EXISTS submissions (
+            submission_id TEXT PRIMARY KEY,
+            date TEXT,
+            username TEXT,
+            client_name TEXT,
+            responses INTEGER NOT NULL
+        );
+
+        CREATE TABLE IF NOT EXISTS response_counts (
+            day TEXT NOT NULL,
+            username TEXT,
+            client_name TEXT,
+            "group" TEXT,
+            question TEXT,
+            oui INTEGER NOT NULL DEFAULT 0,
+            non INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, username, client_name, "group", question)
+        );
+
+        CREATE TABLE IF NOT EXISTS question_groups (
+            position INTEGER PRIMARY KEY,
+            key TEXT,
+            data TEXT NOT NULL
+        );
+
+        CREATE TABLE IF NOT EXISTS users (
+            username TEXT PRIMARY KEY,
+            role TEXT,
+            data TEXT NOT NULL
+        );
+    """
+
+    def __init__(self, db_path=SQLITE_FILE):
+        self.db_path = db_path
+        self._local = threading.local()
+
+    def files(self, kind):
+        """Fichiers dont dépend un type de données (pour l'invalidation du cache)"""
+        return [self.db_path, f"{self.db_path}-wal"]
+
+    def connect(self):
+        """Retourne la connexion du thread courant (une par session Streamlit)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            # SQLite sérialise lui-même les écrivains ; attendre le verrou plutôt qu'échouer
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(self.SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _row_to_response(row):
+        """Reconstruit un enregistrement de réponse depuis une ligne SQL"""
+        record = json.loads(row['extra']) if row['extra'] else {}
+        for col in RESPONSE_COLUMNS:
+            record[col] = row[col]
+        return record
+
+    @staticmethod
+    def _response_to_row(record):
+        """Prépare un enregistrement de réponse pour l'insertion SQL"""
+        extra = {k: v for k, v in record.items() if k not in RESPONSE_COLUMNS}
+        return [record.get(col) for col in RESPONSE_COLUMNS] + [json.dumps(extra, ensure_ascii=False) if extra else None]
+
+    def _where(self, client_name=None, username=None, group=None, start_date=None, end_date=None):
+        """Construit la clause WHERE (colonnes indexées uniquement)"""
+        clauses, params = [], []
+        start, end = _date_bounds(start_date, end_date)
+        for clause, value in (("client_name = ?", client_name), ("username = ?", username),
+                              ('"group" = ?', group), ("date >= ?", start), ("date < ?", end)):
+            if value is not None:
+                clauses.append(clause)
+                params.append(value)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def load_responses(self, **filters):
+        """Charge les réponses correspondant aux filtres"""
+        where, params = self._where(**filters)
+        rows = self.connect().execute(f"SELECT * FROM responses{where} ORDER BY id", params)
+        return [self._row_to_response(row) for row in rows]
+
+    def response_facets(self, username=None):
+        """Retourne les valeurs distinctes utiles aux filtres du dashboard"""
+        conn = self.connect()
+        where, params = self._where(username=username)
+        row = conn.execute(f"SELECT COUNT(*), MIN(date), MAX(date) FROM responses{where}", params).fetchone()
+
+        def distinct(column):
+            query = f'SELECT DISTINCT {column} FROM responses{where} ORDER BY {column}'
+            return [r[0] for r in conn.execute(query, params)]
+
+        return {
+            'count': row[0],
+            'clients': distinct("client_name"),
+            'users': distinct("username"),
+            'groups': distinct('"group"'),
+            'min_date': row[1],
+            'max_date': row[2],
+        }
+
+    def _insert_responses(self, conn, records):
+        """Insère des réponses et leurs questionnaires (sans valider la transaction)"""
+        conn.executemany(
+            'INSERT INTO responses (date, username, client_name, "group", group_title, '
+            'question, response, comment, extra) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            [self._response_to_row(r) for r in records]
+        )
+        submissions = {}
+        for record in records:
+            if record.get('submission_id'):
+                entry = submissions.setdefault(record['submission_id'], [
+                    record['submission_id'], record.get('date'), record.get('username'), record.get('client_name'), 0
+                ])
+                entry[4] += 1
+        conn.executemany(
+            "INSERT OR IGNORE INTO submissions (submission_id, date, username, client_name, responses) "
+            "VALUES (?, ?, ?, ?, ?)",
+            list(submissions.values())
+        )
+
+    def response_version(self):
+        """Version des réponses : (nombre, dernier identifiant), les lignes ne sont jamais modifiées"""
+        return list(self.connect().execute("SELECT COUNT(*), COALESCE(MAX(id), 0) FROM responses").fetchone())
+
+    def submission_ids(self):
+        """Identifiants des questionnaires déjà enregistrés"""
+        return {row[0] for row in self.connect().execute("SELECT submission_id FROM submissions")}
+
+    def _upsert_counts(self, conn, records):
+        """Incrémente les compteurs agrégés (sans valider la transaction)"""
+        counts = _add_counts({}, records)
+        conn.executemany(
+            'INSERT INTO response_counts (day, username, client_name, "group", question, oui, non) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?) '
+            'ON CONFLICT (day, username, client_name, "group", question) '
+            'DO UPDATE SET oui = oui + excluded.oui, non = non + excluded.non',
+            [list(k) + v for k, v in counts.items()]
+        )
+
+    def _rebuild_counts(self, conn):
+        """Recalcule tous les compteurs agrégés depuis la table des réponses"""
+        conn.execute("DELETE FROM response_counts")
+        conn.execute(
+            'INSERT INTO response_counts (day, username, client_name, "group", question, oui, non) '
+            'SELECT substr(date, 1, 10), username, client_name, "group", question, '
+            "SUM(response = 'Oui'), SUM(response IS NOT 'Oui') "
+            'FROM responses GROUP BY 1, 2, 3, 4, 5'
+        )
+
+    def load_counts(self, client_name=None, username=None, group=None, start_date=None, end_date=None):
+        """Charge les compteurs Oui/Non agrégés correspondant aux filtres"""
+        conn = self.connect()
+        if (not conn.execute("SELECT 1 FROM response_counts LIMIT 1").fetchone()
+                and conn.execute("SELECT 1 FROM responses LIMIT 1").fetchone()):
+            with conn:
+                self._rebuild_counts(conn)
+
+        clauses, params = [], []
+        for clause, value in (("client_name = ?", client_name), ("username = ?", username), ('"group" = ?', group),
+                              ("day >= ?", start_date.isoformat() if start_date else None),
+                              ("day <= ?", end_date.isoformat() if end_date else None)):
+            if value is not None:
+                clauses.append(clause)
+                params.append(value)
+        where = " WHERE " + " AND ".join(clauses) if clauses else ""
+        rows = conn.execute(
+            f'SELECT day, username, client_name, "group", question, oui, non FROM response_counts{where}', params
+        )
+        return [list(row) for row in rows]
+
+    def save_responses(self, records):
+        """Ajoute des réponses et met à jour les compteurs dans une seule transaction"""
+        conn = self.connect()
+        with conn:
+            self._insert_responses(conn, records)
+            self._upsert_counts(conn, records)
+
+    def load_questions(self):
+        """Charge les groupes de questions"""
+        rows = self.connect().execute("SELECT data FROM question_groups ORDER BY position")
+        return [json.loads(row['data']) for row in rows]
+
+    def save_questions(self, questions):
+        """Sauvegarde les groupes de questions"""
+        conn = self.connect()
+        with conn:
+            conn.execute("DELETE FROM question_groups")
+            conn.executemany(
+                "INSERT INTO question_groups (position, key, data) VALUES (?, ?, ?)",
+                [(i, g.get('key'), json.dumps(g, ensure_ascii=False)) for i, g in enumerate(questions)]
+            )
+
+    def load_users(self):
+        """Charge les utilisateurs"""
+        rows = self.connect().execute("SELECT username, data FROM users")
+        return {row['username']: json.loads(row['data']) for row in rows}
+
+    def save_users(self, users):
+        """Sauvegarde les utilisateurs"""
+        conn = self.connect()
+        with conn:
+            conn.execute("DELETE FROM users")
+            conn.executemany(
+                "INSERT INTO users (username, role, data) VALUES (?, ?, ?)",
+                [(u, d.get('role'), json.dumps(d, ensure_ascii=False)) for u, d in users.items()]
+            )
+
+    def import_from_files(self):
+        """Importe les fichiers JSON (données existantes ou backup restauré) dans SQLite"""
+        json_storage = JsonStorage()
+        conn = self.connect()
+        with conn:
+            conn.execute("DELETE FROM responses")
+            conn.execute("DELETE FROM submissions")
+            self._insert_responses(conn, json_storage.load_responses())
+            self._rebuild_counts(conn)
+        self.save_questions(json_storage.load_questions())
+        self.save_users(json_storage.load_users())
+
+    def export_to_files(self):
+        """Exporte le contenu SQLite vers les fichiers JSON (pour les backups)"""
+        temp_file = f"{HISTORY_LOG_FILE}.tmp"
+        os.makedirs(RESPONSES_DIR, exist_ok=True)
+        with file_lock(HISTORY_LOG_FILE):
+            with open(temp_file, "w", encoding='utf-8') as f:
+                _write_lines(f, self.load_responses())
+            os.replace(temp_file, HISTORY_LOG_FILE)
+        _write_json(QUESTIONS_FILE, self.load_questions())
+        _write_json(USERS_FILE, self.load_users())
+
+
+_storage = None
+
+
+def get_storage():
+    """Retourne le backend de stockage configuré (TAZRIGT_STORAGE)"""
+    global _storage
+    if _storage is None:
+        if STORAGE_BACKEND == "sqlite":
+            _storage = SQLiteStorage()
+            # Première utilisation : reprendre les données JSON existantes
+            conn = _storage.connect()
+            if not conn.execute("PRAGMA user_version").fetchone()[0]:
+                _storage.import_from_files()
+                conn.execute("PRAGMA user_version = 1")
+        else:
+            _storage = JsonStorage()
+    return _storage
+
+
+def _cached(kind, key, loader):
+    """Charge des données via le cache partagé"""
+    return _cache.get(get_storage().files(kind), (kind, key), loader)
+
+
+def _invalidate(kind):
+    """Invalide le cache après une écriture"""
+    _cache.invalidate(get_storage().files(kind)[0])
+
+
+def cache_stats():
+    """Retourne les compteurs hits/misses du cache de données"""
+    return _cache.stats()
+
+
+def load_responses(**filters):
+    """Charge les réponses (filtres : client_name, username, group, start_date, end_date)
+
+    Le résultat est partagé entre les sessions : ne pas le modifier.
+    """
+    key = tuple(sorted(filters.items()))
+    return _cached('responses', key, lambda: get_storage().load_responses(**filters))
+
+
+def response_facets(username=None):
+    """Retourne les clients, utilisateurs, groupes et bornes de dates disponibles"""
+    return _cached('responses', ('facets', username), lambda: get_storage().response_facets(username=username))
+
+
+def response_version():
+    """Version courante des réponses (comparée par les instantanés pour détecter un retard)"""
+    return get_storage().response_version()
+
+
+def load_counts(**filters):
+    """Charge les compteurs Oui/Non par (jour, utilisateur, client, groupe, question)
+
+    Le résultat est partagé entre les sessions : ne pas le modifier.
+    """
+    key = tuple(sorted(filters.items()))
+    return _cached('counts', key, lambda: get_storage().load_counts(**filters))
+
+
+def save_responses(records):
+    """Enregistre des réponses dans le stockage"""
+    get_storage().save_responses(records)
+    _invalidate('responses')
+    _invalidate('counts')
+
+    # Instantané colonnaire (Parquet) écrit à côté du stockage principal
+    import snapshots
+    snapshots.append_snapshot(records)
+
+
+def commit_submissions(submissions):
+    """Enregistre plusieurs questionnaires complets en une seule écriture atomique
+
+    Chaque questionnaire est une liste de réponses. Il reçoit un identifiant
+    de soumission (celui déjà présent dans ses réponses est conservé, ce qui
+    rend idempotente la synchronisation des tablettes hors ligne : un
+    questionnaire déjà enregistré n'est pas dupliqué). Retourne les identifiants.
+    """
+    # Seuls les identifiants fournis (tablettes) peuvent déjà exister : pas de lecture sinon
+    existing = set()
+    if any(responses and responses[0].get('submission_id') for responses in submissions):
+        existing = _cached('responses', 'submission_ids', get_storage().submission_ids)
+    batch, submission_ids = [], []
+    for responses in submissions:
+        if not responses:
+            continue
+        submission_id = responses[0].get('submission_id') or uuid.uuid4().hex
+        submission_ids.append(submission_id)
+        if submission_id in existing:
+            continue
+        existing = existing | {submission_id}
+        batch.extend({**response, 'submission_id': submission_id} for response in responses)
+
+    if batch:
+        save_responses(batch)
+    return submission_ids
+
+
+def commit_submission(responses):
+    """Enregistre un questionnaire complet en une seule écriture atomique"""
+    submission_ids = commit_submissions([responses])
+    return submission_ids[0] if submission_ids else None
+
+
+def load_questions():
+    """Charge les groupes de questions (résultat partagé : ne pas le modifier)"""
+    return _cached('questions', None, get_storage().load_questions)
+
+
+def save_questions(questions):
+    """Sauvegarde les groupes de questions"""
+    get_storage().save_questions(questions)
+    _invalidate('questions')
+
+
+def load_users():
+    """Charge les utilisateurs (copie modifiable)"""
+    return copy.deepcopy(_cached('users', None, get_storage().load_users))
+
+
+def load_user_index():
+    """Index des utilisateurs {nom: (mot de passe, rôle)} partagé entre les sessions
+
+    Reconstruit uniquement quand le stockage des utilisateurs change (mtime ou
+    écriture de ce processus) : ne pas le modifier.
+    """
+    def build():
+        return {
+            username: (data.get("password"), data.get("role", "user"))
+            for username, data in get_storage().load_users().items()
+        }
+    return _cached('users', 'index', build)
+
+
+def save_users(users):
+    """Sauvegarde les utilisateurs"""
+    get_storage().save_users(users)
+    _invalidate('users')
+
+
+if __name__ == "__main__":
+    # python storage.py import|export : conversion JSON <-> SQLite
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    if command == "import":
+        SQLiteStorage().import_from_files()
+        print(f"Données JSON importées dans {SQLITE_FILE}")
+    elif command == "export":
+        SQLiteStorage().export_to_files()
+        print(f"Données de {SQLITE_FILE} exportées en JSON")
+    else:
+        print("Usage : python storage.py import|export")
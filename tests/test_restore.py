@@ -0,0 +1,49 @@
+import json
+import os
+import zipfile
+
+import pytest
+
+import backups
+import storage
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """Répertoire de travail isolé (les chemins de données sont relatifs)"""
+    monkeypatch.chdir(tmp_path)
+    os.makedirs(backups.BACKUP_DIR)
+    os.makedirs(storage.RESPONSES_DIR)
+    return tmp_path
+
+
+def _response(question, response, submission_id=None):
+    record = {'date': "2025-04-05T10:00:00", 'username': "admin", 'client_name': "client",
+              'group': "g1", 'group_title': "Groupe 1", 'question': question, 'response': response}
+    if submission_id:
+        record['submission_id'] = submission_id
+    return record
+
+
+def test_restore_legacy_zip_keeps_bak_of_current_log(workdir):
+    storage.append_responses([_response("q1", "Oui", "s1"), _response("q2", "Non", "s1")])
+    with open(storage.HISTORY_LOG_FILE, "rb") as f:
+        current_log = f.read()
+
+    legacy = [_response("ancienne", "Oui")]
+    backup_path = os.path.join(backups.BACKUP_DIR, "backup_20250405_201425.zip")
+    with zipfile.ZipFile(backup_path, 'w') as zf:
+        zf.writestr(os.path.basename(storage.LEGACY_HISTORY_FILE), json.dumps(legacy))
+
+    restored, errors = backups.restore_backup(backup_path)
+
+    assert errors == {}
+    assert restored == [os.path.basename(storage.LEGACY_HISTORY_FILE)]
+    with open(f"{storage.HISTORY_LOG_FILE}.bak", "rb") as f:
+        assert f.read() == current_log
+    assert storage.read_responses() == legacy
+    # Aucun fichier temporaire ni ancien historique laissé dans le dossier des réponses
+    assert sorted(os.listdir(storage.RESPONSES_DIR)) == sorted([
+        os.path.basename(storage.HISTORY_LOG_FILE), os.path.basename(storage.HISTORY_LOG_FILE) + ".bak",
+        os.path.basename(storage.HISTORY_LOG_FILE) + ".lock",
+    ])
@@ -0,0 +1,202 @@
+import json
+import os
+import queue
+import sys
+import tempfile
+import threading
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
+
+@contextmanager
+def file_lock(path):
+    """Verrou consultatif inter-processus sur un fichier (via un fichier .lock voisin)
+
+    Seuls les écrivains prennent ce verrou : les lecteurs ne sont jamais bloqués.
+    """
+    lock_path = f"{path}.lock"
+    os.makedirs(os.path.dirname(lock_path) or ".", exist_ok=True)
+    with open(lock_path, "a+b") as lock_file:
+        if os.name == "nt":
+            lock_file.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+        else:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if os.name == "nt":
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def atomic_write_json(path, data):
+    """Écrit un JSON dans un fichier temporaire unique puis le substitue atomiquement"""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding='utf-8') as f:
+            json.dump(data, f, indent=4, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+class WriteQueue:
+    """File d'écriture servie par un unique thread écrivain par processus
+
+    Les demandes en attente pour un même fichier sont regroupées : les ajouts
+    ('append') sont concaténés en une seule écriture, les remplacements
+    ('replace') ne conservent que la dernière version. Chaque écriture est
+    faite sous le verrou du fichier pour se protéger des autres processus.
+    """
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self.writes = 0
+        self.requests = 0
+
+    def _ensure_started(self):
+        """Démarre le thread écrivain à la première demande"""
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="storage-writer", daemon=True)
+                self._thread.start()
+
+    def submit(self, path, payload, apply, mode="append"):
+        """Programme une écriture et retourne un Future résolu une fois les données sur disque"""
+        future = Future()
+        self._ensure_started()
+        self._queue.put((path, payload, apply, mode, future))
+        return future
+
+    def write(self, path, payload, apply, mode="append"):
+        """Programme une écriture et attend qu'elle soit terminée"""
+        return self.submit(path, payload, apply, mode).result()
+
+    def _run(self):
+        """Boucle du thread écrivain"""
+        while True:
+            batch = [self._queue.get()]
+            # Regrouper toutes les demandes arrivées entre-temps
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            groups = {}
+            for path, payload, apply, mode, future in batch:
+                groups.setdefault((path, mode, apply), []).append((payload, future))
+
+            for (path, mode, apply), items in groups.items():
+                if mode == "append":
+                    payload = [record for records, _ in items for record in records]
+                else:
+                    payload = items[-1][0]
+                try:
+                    with file_lock(path):
+                        result = apply(payload)
+                    self.writes += 1
+                    self.requests += len(items)
+                    for _, future in items:
+                        future.set_result(result)
+                except BaseException as e:
+                    for _, future in items:
+                        future.set_exception(e)
+
+    def stats(self):
+        """Nombre de demandes reçues et d'écritures effectives (après regroupement)"""
+        return {'requests': self.requests, 'writes': self.writes}
+
+
+_write_queue = WriteQueue()
+
+
+def get_write_queue():
+    """Retourne la file d'écriture du processus"""
+    return _write_queue
+
+
+def _stress_worker(args):
+    """Processus de test : plusieurs threads soumettent des questionnaires en parallèle"""
+    workdir, worker, threads, submissions, questions = args
+    os.chdir(workdir)
+    import storage
+    from writer import get_write_queue
+
+    def submit(thread):
+        for n in range(submissions):
+            client = f"client-{worker}-{thread}-{n}"
+            storage.commit_submission([
+                {"date": "2025-04-06T10:00:00", "username": f"user{worker}", "client_name": client,
+                 "group": "communication", "group_title": "Communication", "question": f"Q{q}",
+                 "response": "Oui" if q % 2 else "Non", "comment": ""}
+                for q in range(questions)
+            ])
+
+    pool = [threading.Thread(target=submit, args=(t,)) for t in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    return get_write_queue().stats()
+
+
+def stress_test(processes=4, threads=8, submissions=20, questions=10):
+    """Soumet des questionnaires depuis plusieurs processus et threads puis vérifie qu'aucun n'est perdu"""
+    from multiprocessing import get_context
+
+    with tempfile.TemporaryDirectory() as workdir:
+        args = [(workdir, w, threads, submissions, questions) for w in range(processes)]
+        with get_context("spawn").Pool(processes) as pool:
+            stats = pool.map(_stress_worker, args)
+
+        cwd = os.getcwd()
+        os.chdir(workdir)
+        try:
+            import storage
+            responses = storage.read_responses()
+            counts = storage.JsonStorage().load_counts()
+        finally:
+            os.chdir(cwd)
+
+    expected = processes * threads * submissions * questions
+    clients = {r['client_name'] for r in responses}
+    return {
+        'expected': expected,
+        'saved': len(responses),
+        'submissions': len(clients),
+        'counted': sum(row[5] + row[6] for row in counts),
+        'requests': sum(s['requests'] for s in stats),
+        'writes': sum(s['writes'] for s in stats),
+        'ok': (len(responses) == expected and len(clients) == processes * threads * submissions
+               and sum(row[5] + row[6] for row in counts) == expected),
+    }
+
+
+if __name__ == "__main__":
+    # python writer.py [processus threads questionnaires]
+    params = [int(arg) for arg in sys.argv[1:4]]
+    result = stress_test(*params)
+    print(json.dumps(result, indent=4))
+    sys.exit(0 if result['ok'] else 1)